@@ -1,28 +1,46 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Request, Response, BackgroundTasks
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import os
-import shutil
+import copy
+import asyncio
 import json
 
 from config import settings
 from database import SessionLocal, engine, Base, init_db, get_db
 from models import User, ClothingItem, Outfit, StyleProfile, ChatMessage, generate_uuid, UserSession
 from services.recommendation_engine import engine as recommendation_engine
+from services.color_lut import ColorLUT
+from services.color_names import COLOR_FAMILIES, color_family
+from services.image_workers import image_workers, ImageQueueFull, ImageJobTimeout
+from services.password_hashing import password_hasher, PasswordQueueFull
+from services.ingestion import (
+    fill_analysis, process_pending_item, processing_status, resume_pending_items, status_payload
+)
+from services.upload_stream import receive_uploads, discard, StoredUpload, UploadRejected
+from services.blob_store import acquire_blob, blob_url, cached_features, release_blob
+from services.wardrobe import (
+    daily_outfit_cache, daily_outfit_key, shopping_cache, wardrobe_version, bump_wardrobe_version, outfit_item
+)
+from services.precompute import precomputed_outfits
+from services.sessions import forget_sessions, forget_user, session_user
 from security import (
     TokenSecurity,
-    verify_password,
+    verify_and_update_password,
     get_password_hash,
-    create_access_token,
-    create_refresh_token,
-    verify_access_token,
+    issue_access_token,
+    issue_refresh_token,
     verify_refresh_token,
+    invalidate_access_tokens,
+    verified_token_cache,
     generate_csrf_token,
     validate_csrf_token,
     validate_request_origin,
@@ -158,6 +176,7 @@ class ClothingItemResponse(BaseModel):
     subcategory: Optional[str]
     color: str
     color_hex: Optional[str]
+    color_family: Optional[str]
     image_url: str
     brand: Optional[str]
     created_at: datetime
@@ -191,7 +210,7 @@ async def security_middleware(request: Request, call_next):
         )
 
     client_ip = request.client.host
-    if not rate_limiter.is_allowed(client_ip):
+    if not await rate_limiter.is_allowed_async(client_ip):
         return Response(
             content=json.dumps({"detail": "Muitas requisições. Tente novamente mais tarde."}),
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
@@ -210,28 +229,52 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        user_id = token_data.get("sub")
-        if user_id is None:
-            raise credentials_exception
+    user_id = token_data.get("sub")
+    if user_id is None:
+        raise credentials_exception
 
-        user = db.query(User).filter(User.id == user_id).first()
-        if user is None:
-            raise credentials_exception
+    user = session_user(db, user_id, token_data.get("jti"))
+    if user is None:
+        raise credentials_exception
 
-        session = db.query(UserSession).filter(
-            UserSession.user_id == user_id,
-            UserSession.token_jti == token_data.get("jti"),
-            UserSession.is_active == True
-        ).first()
+    return user
 
-        if not session:
-            raise credentials_exception
+def hash_password_job(fn, *args):
+    """bcrypt no pool dedicado; com a fila cheia responde 503 na hora"""
+    try:
+        return password_hasher.run(fn, *args)
+    except PasswordQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado. Tente novamente em instantes.",
+            headers={"Retry-After": "1"}
+        )
 
-        return user
+def open_session(db: Session, user_id: str, request: Request) -> Dict:
+    """Emite o par de tokens e registra a sessão; o commit fica com a rota"""
+    access_token, access_claims = issue_access_token(data={"sub": user_id})
+    refresh_token, refresh_claims = issue_refresh_token(data={"sub": user_id})
 
-    except Exception:
-        raise credentials_exception
+    now = datetime.utcnow()
+    db.add(UserSession(
+        id=generate_uuid(),
+        user_id=user_id,
+        access_token_jti=access_claims["jti"],
+        refresh_token_jti=refresh_claims["jti"],
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        is_active=True,
+        created_at=now,
+        last_activity=now
+    ))
+
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "csrf_token": generate_csrf_token(user_id)
+    }
 
 def get_csrf_token(user: User = Depends(get_current_user)):
     return generate_csrf_token(user.id)
@@ -260,21 +303,21 @@ def register_user(
             detail="CSRF token necessário"
         )
 
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
+    taken = db.query(User.email, User.username).filter(
+        or_(User.email == user.email, User.username == user.username)
+    ).all()
+    if any(email == user.email for email, _ in taken):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email já registrado"
         )
-
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if db_user:
+    if taken:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Nome de usuário já existe"
         )
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = hash_password_job(get_password_hash, user.password)
     new_user = User(
         id=generate_uuid(),
         username=user.username,
@@ -282,10 +325,7 @@ def register_user(
         hashed_password=hashed_password,
         created_at=datetime.utcnow()
     )
-
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
 
     style_profile = StyleProfile(
         id=generate_uuid(),
@@ -297,36 +337,18 @@ def register_user(
     )
     db.add(style_profile)
 
-    access_token = create_access_token(data={"sub": new_user.id})
-    refresh_token = create_refresh_token(data={"sub": new_user.id})
-
-    access_token_data = verify_access_token(access_token)
-    refresh_token_data = verify_refresh_token(refresh_token)
+    tokens = open_session(db, new_user.id, request)
 
-    session = UserSession(
-        id=generate_uuid(),
-        user_id=new_user.id,
-        access_token_jti=access_token_data.get("jti"),
-        refresh_token_jti=refresh_token_data.get("jti"),
-        ip_address=request.client.host,
-        user_agent=request.headers.get("user-agent", ""),
-        is_active=True,
-        created_at=datetime.utcnow(),
-        last_activity=datetime.utcnow()
-    )
-    db.add(session)
-
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email ou nome de usuário já registrado"
+        )
 
-    csrf_token = generate_csrf_token(new_user.id)
-
-    return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
-        "token_type": "bearer",
-        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-        "csrf_token": csrf_token
-    }
+    return tokens
 
 @app.post("/api/auth/login", response_model=TokenResponse)
 def login_user(
@@ -345,52 +367,36 @@ def login_user(
     client_ip = request.client.host
     login_key = f"login_attempts_{client_ip}"
 
-    if not rate_limiter.is_allowed(f"login_{client_ip}"):
+    if not rate_limiter.is_allowed(client_ip, "login"):
         raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUISITIONS,
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail="Muitas tentativas de login. Tente novamente em alguns minutos."
         )
 
     user = db.query(User).filter(User.email == login.email).first()
-    if not user or not verify_password(login.password, user.hashed_password):
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou senha incorretos",
         )
 
-    user.last_login = datetime.utcnow()
-
-
-    access_token = create_access_token(data={"sub": user.id})
-    refresh_token = create_refresh_token(data={"sub": user.id})
+    valid, new_hash = hash_password_job(verify_and_update_password, login.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Email ou senha incorretos",
+        )
 
-    access_token_data = verify_access_token(access_token)
-    refresh_token_data = verify_refresh_token(refresh_token)
+    if new_hash:
+        user.hashed_password = new_hash
+    user.last_login = datetime.utcnow()
 
-    session = UserSession(
-        id=generate_uuid(),
-        user_id=user.id,
-        access_token_jti=access_token_data.get("jti"),
-        refresh_token_jti=refresh_token_data.get("jti"),
-        ip_address=request.client.host,
-        user_agent=request.headers.get("user-agent", ""),
-        is_active=True,
-        created_at=datetime.utcnow(),
-        last_activity=datetime.utcnow()
-    )
-    db.add(session)
+    tokens = open_session(db, user.id, request)
 
     db.commit()
+    forget_user(user.id)
 
-    csrf_token = generate_csrf_token(user.id)
-
-    return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
-        "token_type": "bearer",
-        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-        "csrf_token": csrf_token
-    }
+    return tokens
 
 @app.post("/api/auth/refresh", response_model=TokenResponse)
 def refresh_token(
@@ -422,37 +428,14 @@ def refresh_token(
 
     session.is_active = False
     session.ended_at = datetime.utcnow()
+    invalidate_access_tokens(session.access_token_jti)
+    forget_sessions(session.access_token_jti)
 
-    access_token = create_access_token(data={"sub": user_id})
-    refresh_token = create_refresh_token(data={"sub": user_id})
-
-    access_token_data = verify_access_token(access_token)
-    refresh_token_data = verify_refresh_token(refresh_token)
-
-    new_session = UserSession(
-        id=generate_uuid(),
-        user_id=user_id,
-        access_token_jti=access_token_data.get("jti"),
-        refresh_token_jti=refresh_token_data.get("jti"),
-        ip_address=request.client.host,
-        user_agent=request.headers.get("user-agent", ""),
-        is_active=True,
-        created_at=datetime.utcnow(),
-        last_activity=datetime.utcnow()
-    )
-    db.add(new_session)
+    tokens = open_session(db, user_id, request)
 
     db.commit()
 
-    csrf_token = generate_csrf_token(user_id)
-
-    return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
-        "token_type": "bearer",
-        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-        "csrf_token": csrf_token
-    }
+    return tokens
 
 @app.post("/api/auth/logout")
 def logout_user(
@@ -460,15 +443,19 @@ def logout_user(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db.query(UserSession).filter(
+    active_sessions = db.query(UserSession).filter(
         UserSession.user_id == current_user.id,
         UserSession.is_active == True
-    ).update({
+    )
+    access_jtis = [jti for (jti,) in active_sessions.with_entities(UserSession.access_token_jti)]
+    active_sessions.update({
         "is_active": False,
         "ended_at": datetime.utcnow()
     })
 
     db.commit()
+    invalidate_access_tokens(*access_jtis)
+    forget_sessions(*access_jtis)
 
     return {"message": "Logout realizado com sucesso"}
 
@@ -504,6 +491,8 @@ def revoke_session(
 
     session.is_active = False
     session.ended_at = datetime.utcnow()
+    invalidate_access_tokens(session.access_token_jti)
+    forget_sessions(session.access_token_jti)
 
     db.commit()
 
@@ -524,69 +513,110 @@ def update_profile(
     db: Session = Depends(get_db)
 ):
 
+    user = db.query(User).filter(User.id == current_user.id).first()
     for field, value in profile_update.dict(exclude_unset=True).items():
-        setattr(current_user, field, value)
+        setattr(user, field, value)
 
-    current_user.updated_at = datetime.utcnow()
+    user.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(current_user)
+    db.refresh(user)
+    forget_user(user.id)
+
+    return {"message": "Perfil atualizado com sucesso", "user": user}
 
-    return {"message": "Perfil atualizado com sucesso", "user": current_user}
+async def check_upload_rate(user: User):
+    if not await rate_limiter.is_allowed_async(user.id, "upload"):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Muitos uploads. Tente novamente em alguns minutos."
+        )
 
 @app.post("/api/closet/upload")
 async def upload_clothing_item(
-    file: UploadFile = File(...),
-    category: str = Form("uncategorized"),
-    subcategory: Optional[str] = Form(None),
-    color: Optional[str] = Form(None),
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    background: bool = Query(False),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """Recebe uma foto (campos file, category, subcategory, color) em streaming"""
+    await check_upload_rate(current_user)
 
-    file.file.seek(0, 2)  # Vai para o final do arquivo
-    file_size = file.file.tell()
-    file.file.seek(0)  # Volta para o início
-
-    if file_size > settings.MAX_UPLOAD_SIZE:
+    if background and image_workers.saturated:
         raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"Arquivo muito grande. Tamanho máximo: {settings.MAX_UPLOAD_SIZE / (1024*1024)}MB"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado analisando imagens. Tente novamente em instantes.",
+            headers={"Retry-After": "5"}
         )
 
-    allowed_types = ["image/jpeg", "image/png", "image/webp", "image/gif"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(
-            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-            detail=f"Tipo de arquivo não suportado. Tipos permitidos: {', '.join(allowed_types)}"
+    try:
+        fields, uploads = await receive_uploads(
+            request, settings.UPLOAD_DIR, settings.MAX_UPLOAD_SIZE, strict=True
         )
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
-    upload_dir = settings.UPLOAD_DIR
-    os.makedirs(upload_dir, exist_ok=True)
-
-    file_extension = file.filename.split(".")[-1] if "." in file.filename else "jpg"
-    item_id = generate_uuid()
-
-    safe_filename = f"{item_id}.{file_extension}"
-    file_path = os.path.join(upload_dir, safe_filename)
+    if not uploads:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nenhum arquivo enviado")
 
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    category = fields.get("category") or "uncategorized"
+    subcategory = fields.get("subcategory") or None
+    color = fields.get("color") or None
 
-    processed_data = await recommendation_engine.process_clothing_image(file_path)
+    upload = uploads[0]
+    blob, _ = acquire_blob(db, upload)
 
     clothing_item = ClothingItem(
-        id=item_id,
+        id=upload.item_id,
         user_id=current_user.id,
         category=category,
-        subcategory=subcategory or processed_data.get("subcategory", "uncategorized"),
-        color=color or processed_data.get("color", "unknown"),
-        color_hex=processed_data.get("color", "#808080"),
-        image_url=f"/uploads/{safe_filename}",
-        processed_features=processed_data,
+        subcategory=subcategory,
+        color=color or "unknown",
+        color_family=color_family(color),
+        image_url=blob_url(blob),
         created_at=datetime.utcnow()
     )
-
     db.add(clothing_item)
+    bump_wardrobe_version(db, current_user.id)
+
+    if blob.features is None and background:
+        db.commit()
+
+        background_tasks.add_task(process_pending_item, upload.item_id, upload.path, color, subcategory)
+
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {
+            "message": "Peça recebida, análise em andamento",
+            "item_id": upload.item_id,
+            "status": "pending",
+            "status_url": f"/api/closet/{upload.item_id}/status"
+        }
+
+    if blob.features is not None:
+        processed_data = cached_features(db, blob.sha256)
+    else:
+        try:
+            processed_data = await recommendation_engine.process_clothing_image(upload.path)
+        except ImageQueueFull:
+            db.rollback()
+            await discard(upload)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado analisando imagens. Tente novamente em instantes.",
+                headers={"Retry-After": "5"}
+            )
+        except ImageJobTimeout:
+            db.rollback()
+            await discard(upload)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Tempo limite excedido ao analisar a imagem"
+            )
+        blob.features = processed_data
+
+    fill_analysis(clothing_item, processed_data, color, subcategory)
+
     db.commit()
     db.refresh(clothing_item)
 
@@ -596,11 +626,139 @@ async def upload_clothing_item(
         "analysis": processed_data
     }
 
+@app.post("/api/closet/upload/batch")
+async def upload_clothing_items_batch(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Envia várias fotos (campos files, category) numa requisição.
+
+    Cada arquivo começa a ser analisado assim que termina de chegar; as peças
+    são inseridas num único commit.
+    """
+    await check_upload_rate(current_user)
+
+    slots = asyncio.Semaphore(image_workers.max_workers)
+    jobs = {}
+
+    async def analyze(upload: StoredUpload) -> Dict:
+        cached = cached_features(db, upload.sha256)
+        if cached is not None:
+            return cached
+        async with slots:
+            return await recommendation_engine.process_clothing_image(upload.path)
+
+    def start_analysis(upload: StoredUpload):
+        if upload.sha256 not in jobs:
+            jobs[upload.sha256] = asyncio.ensure_future(analyze(upload))
+
+    try:
+        fields, uploads = await receive_uploads(
+            request, settings.UPLOAD_DIR, settings.MAX_UPLOAD_SIZE,
+            max_files=settings.MAX_BATCH_UPLOAD_FILES, on_file=start_analysis
+        )
+    except UploadRejected as e:
+        for job in jobs.values():
+            job.cancel()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    category = fields.get("category") or "uncategorized"
+
+    results = []
+    new_items = []
+    committed = False
+    try:
+        for upload in uploads:
+            result = {"filename": upload.filename}
+            results.append(result)
+            if upload.error:
+                result.update(status="error", detail=upload.error.detail)
+                continue
+
+            result["item_id"] = upload.item_id
+            try:
+                processed_data = copy.deepcopy(await jobs[upload.sha256])
+            except Exception:
+                await discard(upload)
+                result.update(status="error", detail="Não foi possível analisar a imagem. Tente novamente.")
+                continue
+
+            blob, _ = acquire_blob(db, upload)
+            if blob.features is None:
+                blob.features = processed_data
+
+            clothing_item = ClothingItem(
+                id=upload.item_id,
+                user_id=current_user.id,
+                category=category,
+                image_url=blob_url(blob),
+                created_at=datetime.utcnow()
+            )
+            fill_analysis(clothing_item, processed_data)
+            db.add(clothing_item)
+            new_items.append(clothing_item)
+
+            result.update(status=processing_status(clothing_item), color_hex=clothing_item.color_hex,
+                          subcategory=clothing_item.subcategory)
+
+        if new_items:
+            bump_wardrobe_version(db, current_user.id)
+        db.commit()
+        committed = True
+    finally:
+        if not committed:
+            # erro inesperado ou cliente desconectou: nada desta requisição fica para trás
+            for job in jobs.values():
+                job.cancel()
+            db.rollback()
+            for upload in uploads:
+                await discard(upload)
+
+    return {
+        "message": f"{len(new_items)} de {len(uploads)} peças adicionadas",
+        "created": len(new_items),
+        "failed": len(uploads) - len(new_items),
+        "results": results
+    }
+
+@app.get("/api/closet/status")
+def get_closet_items_status(
+    ids: List[str] = Query(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Status de processamento de várias peças de uma vez"""
+    items = db.query(ClothingItem).filter(
+        ClothingItem.user_id == current_user.id,
+        ClothingItem.id.in_(ids)
+    ).all()
+
+    return {"items": [status_payload(item) for item in items]}
+
+@app.get("/api/closet/{item_id}/status")
+def get_clothing_item_status(
+    item_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    item = db.query(ClothingItem).filter(
+        ClothingItem.id == item_id,
+        ClothingItem.user_id == current_user.id
+    ).first()
+
+    if not item:
+        raise HTTPException(status_code=404, detail="Item não encontrado")
+
+    return status_payload(item)
+
 @app.get("/api/closet", response_model=List[ClothingItemResponse])
 def get_closet_items(
     category: Optional[str] = None,
+    color: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    csrf_token: str = Depends(get_csrf_token)
+    csrf_token: str = Depends(get_csrf_token),
+    db: Session = Depends(get_db)
 ):
 
     query = db.query(ClothingItem).filter(ClothingItem.user_id == current_user.id)
@@ -608,6 +766,15 @@ def get_closet_items(
     if category:
         query = query.filter(ClothingItem.category == category)
 
+    if color:
+        family = color if color in COLOR_FAMILIES else color_family(color)
+        if family is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cor não reconhecida. Use uma de: {', '.join(COLOR_FAMILIES)}"
+            )
+        query = query.filter(ClothingItem.color_family == family)
+
     items = query.order_by(ClothingItem.created_at.desc()).all()
     return items
 
@@ -626,14 +793,17 @@ def delete_clothing_item(
     if not item:
         raise HTTPException(status_code=404, detail="Item não encontrado")
 
-    if item.image_url:
-        image_path = item.image_url.replace("/uploads/", f"{settings.UPLOAD_DIR}/")
-        if os.path.exists(image_path):
-            os.remove(image_path)
+    unused_blob = release_blob(db, item.image_url)
 
     db.delete(item)
+    bump_wardrobe_version(db, current_user.id)
     db.commit()
 
+    if unused_blob:
+        image_path = item.image_url.replace("/uploads/", f"{settings.UPLOAD_DIR}/")
+        if os.path.exists(image_path):
+            os.remove(image_path)
+
     return {"message": "Item removido com sucesso"}
 
 @app.get("/api/outfits/daily")
@@ -641,35 +811,33 @@ def get_daily_outfits(
     weather: str = Query("moderate"),
     occasion: str = Query("casual"),
     temperature: int = Query(24),
+    top_k: int = Query(5, ge=1, le=20),
+    budget_ms: Optional[float] = Query(None, gt=0),
     current_user: User = Depends(get_current_user),
     csrf_token: str = Depends(get_csrf_token),
     db: Session = Depends(get_db)
 ):
-    items = db.query(ClothingItem).filter(ClothingItem.user_id == current_user.id).all()
+    version = wardrobe_version(db, current_user.id)
+    cache_key = daily_outfit_key(current_user.id, version, weather, occasion, temperature, top_k, budget_ms)
+    cached = daily_outfit_cache.get(cache_key)
 
-    if not items:
-        return {"outfits": [], "message": "Adicione peças ao seu guarda-roupa primeiro"}
+    if cached is None and budget_ms is None:
+        cached = precomputed_outfits(db, current_user.id, version, weather, occasion, temperature, top_k)
+        if cached is not None:
+            daily_outfit_cache.set(cache_key, cached)
 
-    items_dict = []
-    for item in items:
-        item_dict = {
-            "id": item.id,
-            "category": item.category,
-            "subcategory": item.subcategory,
-            "color": item.color,
-            "color_hex": item.color_hex,
-            "image_url": item.image_url,
-            "fabric": item.fabric,
-            "brand": item.brand
-        }
-        items_dict.append(item_dict)
+    if cached is None:
+        cached = _search_daily_outfits(db, current_user, weather, occasion, temperature, top_k, budget_ms)
+        if cached and not cached[1]["truncated"]:
+            daily_outfit_cache.set(cache_key, cached)
 
-    outfits = recommendation_engine.generate_daily_outfit(
-        items_dict, weather, occasion, temperature
-    )
+    if not cached:
+        return {"outfits": [], "message": "Adicione peças ao seu guarda-roupa primeiro"}
 
+    outfits, search_stats = cached
     return {
         "outfits": outfits,
+        "search": search_stats,
         "weather": weather,
         "occasion": occasion,
         "temperature": temperature,
@@ -677,6 +845,18 @@ def get_daily_outfits(
         "csrf_token": csrf_token  # Novo token para próxima requisição
     }
 
+def _search_daily_outfits(db: Session, user: User, weather: str, occasion: str, temperature: int,
+                          top_k: int, budget_ms: Optional[float]) -> tuple:
+    """Carrega o guarda-roupa e roda a busca; () se não houver peças"""
+    items = db.query(ClothingItem).filter(ClothingItem.user_id == user.id).all()
+
+    if not items:
+        return ()
+
+    return recommendation_engine.search_outfits(
+        [outfit_item(item) for item in items], weather, occasion, temperature, top_k, budget_ms
+    )
+
 @app.post("/api/outfits/save")
 def save_outfit(
     outfit_data: OutfitCreate,
@@ -744,10 +924,39 @@ async def send_chat_message(
         "ai_response": ai_message
     }
 
+def _closet_palette(db: Session, user_id: str, season: str) -> Dict:
+    """Encaixe do guarda-roupa na paleta, gravando o resultado nas peças que não o tinham"""
+    user_items = db.query(ClothingItem).filter(
+        ClothingItem.user_id == user_id,
+        ClothingItem.processed_features.isnot(None)
+    ).all()
+    user_items = [item for item in user_items if not item.processed_features.get("error")]
+
+    items_dict = [
+        {
+            "id": item.id,
+            "color_hex": item.color_hex,
+            "palette_fit": item.processed_features.get("palette_fit")
+        }
+        for item in user_items
+    ]
+    closet = recommendation_engine.score_closet_palette(items_dict, season)
+
+    changed = False
+    for item, item_dict in zip(user_items, items_dict):
+        if item_dict["palette_fit"] != item.processed_features.get("palette_fit"):
+            item.processed_features = {**item.processed_features, "palette_fit": item_dict["palette_fit"]}
+            changed = True
+    if changed:
+        db.commit()
+
+    return closet
+
 @app.post("/api/colors/analyze")
 def analyze_colors(
     analysis_request: ColorAnalysisRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
 
     analysis = recommendation_engine.analyze_color_season(
@@ -755,6 +964,7 @@ def analyze_colors(
         analysis_request.eye_color,
         analysis_request.hair_color
     )
+    analysis["closet"] = _closet_palette(db, current_user.id, analysis["season"])
 
     return {
         "analysis": analysis,
@@ -762,35 +972,59 @@ def analyze_colors(
         "analyzed_at": datetime.utcnow()
     }
 
+@app.get("/api/colors/closet")
+def closet_palette(
+    season: Optional[str] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    season = season or current_user.color_season
+    if season not in recommendation_engine.color_seasons:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Temporada inválida. Use uma de: {', '.join(recommendation_engine.color_seasons)}"
+        )
+
+    return _closet_palette(db, current_user.id, season)
+
 @app.get("/api/shopping/recommendations")
 def get_shopping_recommendations(
     current_user: User = Depends(get_current_user),
     csrf_token: str = Depends(get_csrf_token),
     db: Session = Depends(get_db)
 ):
-    user_items = db.query(ClothingItem).filter(ClothingItem.user_id == current_user.id).all()
-
-    if not user_items:
+    cache_key = (current_user.id, wardrobe_version(db, current_user.id))
+    cached = shopping_cache.get(cache_key)
+
+    if cached is None:
+        user_items = db.query(ClothingItem).filter(ClothingItem.user_id == current_user.id).all()
+
+        items_dict = []
+        for item in user_items:
+            item_dict = {
+                "id": item.id,
+                "category": item.category,
+                "subcategory": item.subcategory,
+                "color": item.color,
+                "color_hex": item.color_hex,
+                "color_family": item.color_family,
+                "brand": item.brand,
+                "price": item.price,
+                "color_features": (item.processed_features or {}).get("color_features")
+            }
+            items_dict.append(item_dict)
+
+        recommendations = recommendation_engine.generate_shopping_recommendations(items_dict, []) if items_dict else []
+        cached = (recommendations, len(user_items))
+        shopping_cache.set(cache_key, cached)
+
+    recommendations, total_items = cached
+    if not total_items:
         return {"recommendations": [], "message": "Adicione peças ao seu guarda-roupa para receber recomendações"}
 
-    items_dict = []
-    for item in user_items:
-        item_dict = {
-            "id": item.id,
-            "category": item.category,
-            "subcategory": item.subcategory,
-            "color": item.color,
-            "color_hex": item.color_hex,
-            "brand": item.brand,
-            "price": item.price
-        }
-        items_dict.append(item_dict)
-
-    recommendations = recommendation_engine.generate_shopping_recommendations(items_dict, [])
-
     return {
         "recommendations": recommendations,
-        "total_items": len(user_items),
+        "total_items": total_items,
         "analysis_date": datetime.utcnow(),
         "csrf_token": csrf_token
     }
@@ -840,7 +1074,14 @@ def health_check():
         "security": {
             "csrf_enabled": True,
             "jwt_enabled": True,
-            "rate_limiting": True
+            "rate_limiting": True,
+            "rate_limit_keys": rate_limiter.stats(),
+            "password_hashing": password_hasher.stats()
+        },
+        "caches": {
+            "daily_outfits": daily_outfit_cache.stats(),
+            "shopping": shopping_cache.stats(),
+            "verified_tokens": verified_token_cache.stats()
         }
     }
 
@@ -848,6 +1089,9 @@ def health_check():
 def on_startup():
     init_db()
 
+    if os.path.exists(settings.COLOR_LUT_PATH):
+        recommendation_engine.use_color_lut(ColorLUT(settings.COLOR_LUT_PATH))
+
     db = SessionLocal()
     try:
         demo_user = db.query(User).filter(User.email == "demo@closset.com").first()
@@ -880,6 +1124,18 @@ def on_startup():
     finally:
         db.close()
 
+@app.on_event("startup")
+async def resume_pending_analysis():
+    # tarefas de fundo não sobrevivem a um restart: peças pending antigas voltam para a fila
+    app.state.pending_analysis = asyncio.create_task(
+        resume_pending_items(settings.PENDING_ANALYSIS_RETRY_AFTER)
+    )
+
+@app.on_event("shutdown")
+def on_shutdown():
+    image_workers.shutdown()
+    password_hasher.shutdown()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,257 @@
+"""Teste de carga da API.
+
+Roda o `app` em processo via ASGI (padrão) ou contra um uvicorn local. Use um
+banco de testes: os usuários sintéticos são gravados no banco configurado.
+
+Todas as requisições saem do mesmo IP, então em processo os limites do
+rate limiter são desligados (use --keep-rate-limits para medi-los). Contra
+--base-url, suba o servidor com limites altos, por exemplo:
+    RATE_LIMIT_REQUESTS=1000000 LOGIN_RATE_LIMIT_REQUESTS=1000000 \
+    UPLOAD_RATE_LIMIT_REQUESTS=1000000 uvicorn app:app
+
+Uso (a partir de backend/):
+    python -m benchmarks.load_test --users 50 --concurrency 20 --requests 2000
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000 --mix daily=5,closet=3,login=1
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import random
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+from sqlalchemy import event
+
+from benchmarks.synthetic import synthetic_images, synthetic_wardrobe
+from database import SessionLocal, engine as db_engine, init_db
+from models import ClothingItem, User
+from security import get_password_hash
+from services.color_names import color_family
+
+DEFAULT_MIX = {"login": 1, "closet": 4, "daily": 4, "upload": 1, "chat": 1, "stats": 2}
+LOAD_TEST_PASSWORD = "LoadTest@123"
+EMAIL_DOMAIN = "loadtest.closset.ia"
+UNLIMITED = 10 ** 9
+CHAT_MESSAGES = ["O que eu visto hoje?", "Me sugere um look para o trabalho", "Que cor combina com azul marinho?"]
+
+_request_queries: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("request_queries", default=None)
+
+def _count_query(*_):
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """'daily=5,closet=3' → {'daily': 5, 'closet': 3}"""
+    mix = {}
+    for part in value.split(","):
+        route, _, weight = part.partition("=")
+        if route not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Rota desconhecida: {route}")
+        mix[route] = int(weight or 1)
+    return mix
+
+def seed_users(count: int, items_per_user: int) -> List[str]:
+    """Cria (uma única vez) `count` usuários com guarda-roupas sintéticos; retorna os emails"""
+    init_db()
+    db = SessionLocal()
+    emails = [f"user{index}@{EMAIL_DOMAIN}" for index in range(count)]
+    try:
+        existing = {email for (email,) in db.query(User.email).filter(User.email.in_(emails))}
+        hashed_password = get_password_hash(LOAD_TEST_PASSWORD)
+
+        for index, email in enumerate(emails):
+            if email in existing:
+                continue
+            user = User(username=f"loadtest{index}", email=email, hashed_password=hashed_password)
+            db.add(user)
+            db.flush()
+
+            for item in synthetic_wardrobe(items_per_user, seed=index, prefix=user.id):
+                db.add(ClothingItem(
+                    id=item["id"],
+                    user_id=user.id,
+                    category=item["category"],
+                    subcategory=item["subcategory"],
+                    color=item["color"],
+                    color_hex=item["color_hex"],
+                    color_family=color_family(item["color"], item["color_hex"]),
+                    fabric=item["fabric"],
+                    image_url=item["image_url"],
+                    processed_features={"color_features": item["color_features"]}
+                ))
+            db.commit()
+    finally:
+        db.close()
+
+    return emails
+
+class VirtualUser:
+    """Sessão de um usuário sintético (tokens e CSRF)"""
+
+    def __init__(self, client: httpx.AsyncClient, email: str):
+        self.client = client
+        self.email = email
+        self.headers: Dict[str, str] = {}
+
+    async def login(self) -> httpx.Response:
+        csrf = (await self.client.get("/api/auth/csrf")).json()["csrf_token"]
+        response = await self.client.post(
+            "/api/auth/login",
+            json={"email": self.email, "password": LOAD_TEST_PASSWORD},
+            headers={"X-CSRF-Token": csrf}
+        )
+        if response.status_code == 200:
+            body = response.json()
+            self.headers = {"Authorization": f"Bearer {body['access_token']}", "X-CSRF-Token": body["csrf_token"]}
+        return response
+
+    async def call(self, route: str, images: List[bytes], rng: random.Random) -> httpx.Response:
+        if route == "login":
+            return await self.login()
+        if route == "closet":
+            return await self.client.get("/api/closet", headers=self.headers)
+        if route == "daily":
+            params = {"temperature": rng.randint(5, 35), "weather": rng.choice(["moderate", "rainy"])}
+            return await self.client.get("/api/outfits/daily", params=params, headers=self.headers)
+        if route == "upload":
+            files = {"file": ("peca.jpg", rng.choice(images), "image/jpeg")}
+            return await self.client.post("/api/closet/upload", files=files, data={"category": "top"},
+                                          headers=self.headers)
+        if route == "chat":
+            return await self.client.post("/api/chat/message", json={"content": rng.choice(CHAT_MESSAGES)},
+                                          headers=self.headers)
+        return await self.client.get("/api/stats", headers=self.headers)
+
+async def run_load(client: httpx.AsyncClient, emails: List[str], mix: Dict[str, int], concurrency: int,
+                   total_requests: int, images: List[bytes], seed: int) -> Dict:
+    users = [VirtualUser(client, email) for email in emails]
+    await asyncio.gather(*(user.login() for user in users))
+
+    routes, weights = zip(*mix.items())
+    samples: Dict[str, List] = {route: [] for route in routes}
+    remaining = iter(range(total_requests))
+
+    async def worker(worker_id: int):
+        rng = random.Random(seed + worker_id)
+        for _ in remaining:
+            route = rng.choices(routes, weights)[0]
+            counter = [0]
+            token = _request_queries.set(counter)
+            started = time.perf_counter()
+            try:
+                response = await rng.choice(users).call(route, images, rng)
+                status_code = response.status_code
+            except httpx.HTTPError:
+                status_code = 0
+            finally:
+                _request_queries.reset(token)
+            samples[route].append(((time.perf_counter() - started) * 1000, status_code, counter[0]))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {"elapsed_s": round(elapsed, 3), "routes": samples}
+
+def summarize(samples: Dict[str, List], elapsed: float, count_queries: bool) -> Dict:
+    report = {}
+    for route, route_samples in samples.items():
+        if not route_samples:
+            continue
+        latencies = np.array([latency for latency, _, _ in route_samples])
+        statuses = [status_code for _, status_code, _ in route_samples]
+        errors = sum(1 for status_code in statuses if status_code == 0 or status_code >= 400)
+
+        status_counts = {}
+        for status_code in statuses:
+            status_counts[str(status_code)] = status_counts.get(str(status_code), 0) + 1
+
+        report[route] = {
+            "requests": len(route_samples),
+            "throughput_rps": round(len(route_samples) / elapsed, 2),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+            "error_rate": round(errors / len(route_samples), 4),
+            "status_codes": status_counts,
+            "db_queries_per_request": (
+                round(sum(queries for _, _, queries in route_samples) / len(route_samples), 2)
+                if count_queries else None
+            )
+        }
+    return report
+
+async def main_async(args) -> Dict:
+    emails = seed_users(args.users, args.items)
+
+    with tempfile.TemporaryDirectory() as directory:
+        images = []
+        for path in synthetic_images(directory, args.images, seed=args.seed):
+            with open(path, "rb") as f:
+                images.append(f.read())
+
+    in_process = args.base_url is None
+    if in_process:
+        from app import app
+        from security import rate_limiter
+        from services.image_workers import image_workers
+
+        if not args.keep_rate_limits:
+            rate_limiter.limits = {name: (UNLIMITED, period) for name, (_, period) in rate_limiter.limits.items()}
+
+        event.listen(db_engine, "before_cursor_execute", _count_query)
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)  # erros do app viram 500
+        client = httpx.AsyncClient(transport=transport, base_url="http://localhost")
+    else:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+
+    try:
+        async with client:
+            result = await run_load(client, emails, args.mix, args.concurrency, args.requests, images, args.seed)
+    finally:
+        if in_process:
+            event.remove(db_engine, "before_cursor_execute", _count_query)
+            image_workers.shutdown()
+
+    total = sum(len(route_samples) for route_samples in result["routes"].values())
+    return {
+        "target": args.base_url or "asgi",
+        "rate_limits": "server" if args.base_url else ("kept" if args.keep_rate_limits else "disabled"),
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "requests": total,
+        "elapsed_s": result["elapsed_s"],
+        "throughput_rps": round(total / result["elapsed_s"], 2),
+        "routes": summarize(result["routes"], result["elapsed_s"], count_queries=in_process)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga dos principais endpoints")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--items", type=int, default=60, help="Peças por usuário")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX)
+    parser.add_argument("--images", type=int, default=10, help="Imagens sintéticas usadas nos uploads")
+    parser.add_argument("--base-url", help="Servidor uvicorn; sem ele o app roda em processo")
+    parser.add_argument("--keep-rate-limits", action="store_true",
+                        help="Em processo, mantém os limites do rate limiter (todas as requisições vêm do mesmo IP)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Grava o relatório em JSON neste arquivo")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Benchmarks do motor de recomendação.
+
+Uso (a partir de backend/):
+    python -m benchmarks.recommendation_engine --output bench.json
+    python -m benchmarks.recommendation_engine --compare bench.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.synthetic import random_color, synthetic_images, synthetic_wardrobe
+from services.image_workers import image_workers
+from services.recommendation_engine import engine as recommendation_engine, extract_image_features
+
+WARDROBE_SIZES = [10, 100, 1000, 10000]
+COLOR_PAIRS = 20000
+IMAGE_COUNT = 20
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    samples = np.asarray(samples_ms)
+    return {
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "max_ms": round(float(samples.max()), 3)
+    }
+
+def timed(fn: Callable, repeats: int) -> List[float]:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+def repeats_for(size: int) -> int:
+    return 50 if size <= 100 else 20 if size <= 1000 else 5
+
+def bench_color_compatibility(rng: random.Random) -> Dict[str, float]:
+    pairs = [(random_color(rng), random_color(rng)) for _ in range(COLOR_PAIRS)]
+
+    started = time.perf_counter()
+    for color_a, color_b in pairs:
+        recommendation_engine.color_compatibility(color_a, color_b)
+    pair_rate = COLOR_PAIRS / (time.perf_counter() - started)
+
+    colors = [color for pair in pairs[:1000] for color in pair]
+    started = time.perf_counter()
+    recommendation_engine.color_compatibility_matrix(colors, colors)
+    matrix_rate = len(colors) ** 2 / (time.perf_counter() - started)
+
+    return {
+        "color_compatibility.pairs_per_s": round(pair_rate),
+        "color_compatibility_matrix.pairs_per_s": round(matrix_rate)
+    }
+
+def bench_wardrobe(size: int) -> Dict[str, float]:
+    items = synthetic_wardrobe(size, seed=size)
+    repeats = repeats_for(size)
+    metrics = {}
+
+    daily = percentiles(timed(
+        lambda: recommendation_engine.generate_daily_outfit(items, "moderate", "casual", 22), repeats
+    ))
+    metrics.update({f"daily_outfit.{size}.{name}": value for name, value in daily.items()})
+
+    base_items = itertools.cycle(items)
+    compatible = percentiles(timed(
+        lambda: recommendation_engine.find_compatible_items(next(base_items), items), repeats
+    ))
+    metrics.update({f"find_compatible_items.{size}.{name}": value for name, value in compatible.items()})
+
+    return metrics
+
+def bench_images(count: int) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        paths = synthetic_images(directory, count)
+
+        samples = []
+        tracemalloc.start()
+        for path in paths:
+            started = time.perf_counter()
+            extract_image_features(path)
+            samples.append((time.perf_counter() - started) * 1000)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        async def through_pool():
+            started = time.perf_counter()
+            await asyncio.gather(*(recommendation_engine.process_clothing_image(path) for path in paths))
+            return time.perf_counter() - started
+
+        asyncio.run(through_pool())  # aquece o pool
+        pool_elapsed = asyncio.run(through_pool())
+        image_workers.shutdown()
+
+    metrics = {f"extract_image_features.{name}": value for name, value in percentiles(samples).items()}
+    metrics["extract_image_features.peak_kb"] = round(peak / 1024)
+    metrics["process_clothing_image.images_per_s"] = round(count / pool_elapsed, 2)
+    return metrics
+
+def run(sizes: List[int], images: int, seed: int) -> Dict:
+    rng = random.Random(seed)
+    metrics = bench_color_compatibility(rng)
+    for size in sizes:
+        metrics.update(bench_wardrobe(size))
+    if images:
+        metrics.update(bench_images(images))
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        },
+        "metrics": metrics
+    }
+
+def regressions(current: Dict[str, float], baseline: Dict[str, float], tolerance: float,
+                min_delta_ms: float) -> List[Dict]:
+    """Métricas piores que o baseline além da tolerância.
+
+    Só entram p50 e vazão (`_per_s`); p95/p99/max e memória variam demais
+    entre execuções. No p50 a piora também precisa passar de `min_delta_ms`,
+    senão medições de microssegundos disparam por ruído.
+    """
+    found = []
+    for name, value in current.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        if name.endswith("_per_s"):
+            change = (value - reference) / reference
+            regressed = change < -tolerance
+        elif name.endswith(".p50_ms"):
+            change = (value - reference) / reference
+            regressed = change > tolerance and value - reference > min_delta_ms
+        else:
+            continue
+        if regressed:
+            found.append({"metric": name, "baseline": reference, "current": value, "change": round(change, 3)})
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do motor de recomendação")
+    parser.add_argument("--sizes", type=int, nargs="+", default=WARDROBE_SIZES)
+    parser.add_argument("--images", type=int, default=IMAGE_COUNT, help="0 para pular as imagens")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Grava o resultado em JSON neste arquivo")
+    parser.add_argument("--compare", help="Baseline JSON para detectar regressões")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="Piora mínima absoluta do p50 para contar como regressão")
+    args = parser.parse_args()
+
+    result = run(args.sizes, args.images, args.seed)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        result["regressions"] = regressions(
+            result["metrics"], baseline["metrics"], args.tolerance, args.min_delta_ms
+        )
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+    if result.get("regressions"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import colorsys
+import os
+import random
+from typing import Dict, List
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from services.recommendation_engine import engine as recommendation_engine
+
+# Proporções aproximadas de um guarda-roupa real
+CATEGORY_MIX = [
+    ("top", 0.32), ("bottom", 0.22), ("shoes", 0.14), ("accessory", 0.10),
+    ("dress", 0.08), ("outerwear", 0.07), ("sweater", 0.07)
+]
+SUBCATEGORIES = {
+    "top": ["t-shirt", "shirt", "blouse"], "bottom": ["jeans", "pants", "skirt", "shorts"],
+    "shoes": ["sneakers", "boots", "sandals"], "accessory": ["bag", "belt", "scarf"],
+    "dress": ["dress"], "outerwear": ["jacket", "coat", "blazer"], "sweater": ["sweater", "cardigan"]
+}
+FABRICS = ["cotton", "denim", "linen", "wool", "polyester", "nylon", "silk", "leather"]
+NEUTRAL_COLORS = ["#000000", "#FFFFFF", "#808080", "#1C2E4A", "#F5F5DC", "#C8B89A", "#36454F"]
+NEUTRAL_SHARE = 0.45
+
+def random_color(rng: random.Random) -> str:
+    """Hex com a mistura típica de neutros e cores saturadas"""
+    if rng.random() < NEUTRAL_SHARE:
+        return rng.choice(NEUTRAL_COLORS)
+    r, g, b = colorsys.hsv_to_rgb(rng.random(), rng.uniform(0.35, 0.95), rng.uniform(0.3, 0.95))
+    return f"#{int(r * 255):02X}{int(g * 255):02X}{int(b * 255):02X}"
+
+def synthetic_wardrobe(size: int, seed: int = 0, prefix: str = "item") -> List[Dict]:
+    """Peças no formato de `services.wardrobe.outfit_item`, com as features de cor pré-calculadas"""
+    rng = random.Random(seed)
+    categories, weights = zip(*CATEGORY_MIX)
+
+    items = []
+    for index in range(size):
+        category = rng.choices(categories, weights)[0]
+        color_hex = random_color(rng)
+        items.append({
+            "id": f"{prefix}-{seed}-{index}",
+            "category": category,
+            "subcategory": rng.choice(SUBCATEGORIES[category]),
+            "color": color_hex,
+            "color_hex": color_hex,
+            "image_url": f"/uploads/{prefix}-{index}.jpg",
+            "fabric": rng.choice(FABRICS),
+            "brand": None,
+            "color_features": recommendation_engine.compute_color_features(color_hex)
+        })
+    return items
+
+def synthetic_image(path: str, rng: random.Random, size=(900, 1200)) -> str:
+    """Foto sintética de uma peça: silhueta colorida sobre fundo claro, com sombra e ruído"""
+    background = tuple(rng.randint(200, 250) for _ in range(3))
+    garment = tuple(int(c.lstrip("#")[i:i + 2], 16) for c in [random_color(rng)] for i in (0, 2, 4))
+
+    image = Image.new("RGB", size, background)
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    box = (
+        rng.randint(width // 10, width // 4), rng.randint(height // 10, height // 5),
+        rng.randint(width * 3 // 4, width * 9 // 10), rng.randint(height * 4 // 5, height * 9 // 10)
+    )
+    draw.rounded_rectangle(box, radius=rng.randint(20, 120), fill=garment)
+    accent = tuple(max(0, c - 40) for c in garment)  # costura / cintura
+    draw.rectangle((box[0], box[1] + (box[3] - box[1]) // 3, box[2], box[1] + (box[3] - box[1]) // 3 + 30), fill=accent)
+
+    noise = Image.effect_noise(size, rng.uniform(10, 30)).convert("RGB")
+    image = Image.blend(image, noise, 0.08).filter(ImageFilter.GaussianBlur(1))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    image.save(path, quality=88)
+    return path
+
+def synthetic_images(directory: str, count: int, seed: int = 0) -> List[str]:
+    """Corpus de `count` imagens JPEG/PNG sintéticas em `directory`"""
+    rng = random.Random(seed)
+    paths = []
+    for index in range(count):
+        extension = "png" if index % 5 == 4 else "jpg"
+        paths.append(synthetic_image(os.path.join(directory, f"synthetic-{index}.{extension}"), rng))
+    return paths
@@ -25,6 +25,35 @@ class Settings(BaseSettings):
 
     UPLOAD_DIR: str = "backend/uploads"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    MAX_BATCH_UPLOAD_FILES: int = 50
+
+    IMAGE_WORKERS: int = max(1, (os.cpu_count() or 2) - 1)
+    IMAGE_QUEUE_SIZE: int = 32
+    IMAGE_JOB_TIMEOUT: float = 30.0  # segundos
+    PENDING_ANALYSIS_RETRY_AFTER: int = 300  # segundos; peças pending mais antigas são reanalisadas no startup
+
+    BCRYPT_ROUNDS: int = 12  # hashes com outro custo são refeitos no próximo login
+    PASSWORD_HASH_WORKERS: int = max(1, (os.cpu_count() or 2) // 2)
+    PASSWORD_HASH_QUEUE_SIZE: int = 16  # logins/cadastros em andamento ou na fila
+
+    OUTFIT_CACHE_SIZE: int = 1024
+    OUTFIT_CACHE_TTL: int = 300  # segundos
+    TOKEN_CACHE_SIZE: int = 10000  # access tokens verificados mantidos em memória
+    SESSION_CACHE_SIZE: int = 10000
+    SESSION_CACHE_TTL: int = 60  # segundos; também é a janela em que outro worker aceita uma sessão revogada
+
+    RATE_LIMIT_REQUESTS: int = 60
+    RATE_LIMIT_PERIOD: int = 60  # segundos
+    LOGIN_RATE_LIMIT_REQUESTS: int = 10
+    LOGIN_RATE_LIMIT_PERIOD: int = 60
+    UPLOAD_RATE_LIMIT_REQUESTS: int = 30
+    UPLOAD_RATE_LIMIT_PERIOD: int = 60
+    RATE_LIMIT_BACKEND: str = "memory"  # memory | sqlite | redis
+    RATE_LIMIT_STORE_URL: str = ""  # caminho do SQLite ou redis://, unix://
+    RATE_LIMIT_LEASE_FRACTION: float = 0.05  # fração do limite reservada por ida ao backend
+    RATE_LIMIT_DENY_CACHE: float = 0.25  # segundos em que uma recusa é respondida localmente
+
+    COLOR_LUT_PATH: str = "backend/data/color_lut.npy"  # gerado por `main.py build-color-lut`
 
     class Config:
         env_file = ".env"
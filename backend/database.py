@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 
@@ -20,7 +20,24 @@ def get_db():
     finally:
         db.close()
 
+def _migrate(connection):
+    """Ajustes de esquema que o create_all não faz em bancos existentes"""
+    inspector = inspect(connection)
+    # grafo de compatibilidade persistido, substituído pela matriz vetorizada da busca
+    connection.execute(text("DROP TABLE IF EXISTS item_compatibility"))
+
+    if inspector.has_table("clothing_items"):
+        columns = {column["name"] for column in inspector.get_columns("clothing_items")}
+        if "color_family" not in columns:
+            # peças antigas ficam NULL até `main.py backfill-color-features`
+            connection.execute(text("ALTER TABLE clothing_items ADD COLUMN color_family VARCHAR"))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_clothing_items_color_family ON clothing_items (color_family)"
+        ))
+
 def init_db():
+    with engine.begin() as connection:
+        _migrate(connection)
     Base.metadata.create_all(bind=engine)
 1.3 backend/models.py
 python
@@ -1,5 +1,195 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Optional, Tuple
+
+from config import settings
+from database import SessionLocal, init_db
+from models import ClothingItem, User, WardrobeVersion
+from services.recommendation_engine import RecommendationEngine, engine as recommendation_engine
+from services.color_lut import ColorLUT, build_color_lut, tolerance_report
+from services.color_names import color_family
+from services.precompute import (
+    PRECOMPUTE_OCCASIONS, PRECOMPUTE_WEATHER, compute_user_outfits, outfit_grid, store_user_outfits
+)
+from services.wardrobe import outfit_item
+
+PRECOMPUTE_CHECKPOINT = "backend/data/precompute_outfits.checkpoint.json"
+
+
+def backfill_color_features(batch_size: int = 500) -> int:
+    """Calcula `color_features`, `palette_fit` e `color_family` para peças cadastradas antes do pré-cálculo no upload"""
+    db = SessionLocal()
+    updated = 0
+    try:
+        query = db.query(ClothingItem).order_by(ClothingItem.id)
+        for item in query.yield_per(batch_size):
+            features = dict(item.processed_features or {})
+            if (features.get("color_features") is not None and features.get("palette_fit") is not None
+                    and item.color_family is not None):
+                continue
+
+            item.color_family = color_family(item.color, item.color_hex)
+
+            features["color_features"] = recommendation_engine.compute_color_features(
+                item.color_hex or "#808080"
+            )
+            features["palette_fit"] = recommendation_engine.palette_fit([item.color_hex or "#808080"])[0]
+            item.processed_features = features
+            updated += 1
+
+            if updated % batch_size == 0:
+                db.commit()
+
+        db.commit()
+    finally:
+        db.close()
+
+    return updated
+
+
+def _load_checkpoint(path: str, run: Dict) -> Optional[Dict]:
+    """Checkpoint anterior, se foi gravado com a mesma grade e top_k"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    return checkpoint if checkpoint.get("run") == run else None
+
+
+def _save_checkpoint(path: str, checkpoint: Dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.part"
+    with open(temp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_path, path)
+
+
+def precompute_outfits(chunk_size: int, workers: int, top_k: int, weathers: list, occasions: list,
+                       checkpoint_path: str, restart: bool = False) -> Tuple[int, float]:
+    """Pré-calcula os looks do dia de todos os usuários para a grade clima x ocasião x temperatura.
+
+    Os usuários são percorridos em ordem de id, em lotes; cada lote é gravado
+    numa transação e registrado no checkpoint, então uma execução interrompida
+    continua do último lote concluído. Retorna (usuários, usuários/s).
+    """
+    grid = outfit_grid(weathers, occasions)
+    run = json.loads(json.dumps({"grid": grid, "top_k": top_k}))
+    checkpoint = None if restart else _load_checkpoint(checkpoint_path, run)
+    last_user_id = checkpoint["last_user_id"] if checkpoint else None
+    processed = checkpoint["processed"] if checkpoint else 0
+
+    if checkpoint:
+        print(f"Retomando após {processed} usuários")
+
+    started = time.perf_counter()
+    processed_now = 0
+    rate = 0.0
+
+    db = SessionLocal()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                query = db.query(User.id).order_by(User.id)
+                if last_user_id is not None:
+                    query = query.filter(User.id > last_user_id)
+                user_ids = [user_id for (user_id,) in query.limit(chunk_size)]
+                if not user_ids:
+                    break
+
+                # versões antes das peças: se o guarda-roupa mudar entre as duas
+                # consultas, os looks ficam com a versão antiga e viram cache miss
+                versions = dict(db.query(WardrobeVersion.user_id, WardrobeVersion.version).filter(
+                    WardrobeVersion.user_id.in_(user_ids)
+                ))
+                wardrobes = {user_id: [] for user_id in user_ids}
+                for item in db.query(ClothingItem).filter(ClothingItem.user_id.in_(user_ids)):
+                    wardrobes[item.user_id].append(outfit_item(item))
+
+                jobs = {
+                    pool.submit(compute_user_outfits, items, grid, top_k): user_id
+                    for user_id, items in wardrobes.items() if items
+                }
+                for future in as_completed(jobs):
+                    user_id = jobs[future]
+                    store_user_outfits(db, user_id, versions.get(user_id, 0), top_k, future.result())
+                db.commit()
+
+                last_user_id = user_ids[-1]
+                processed += len(user_ids)
+                processed_now += len(user_ids)
+                _save_checkpoint(checkpoint_path, {"run": run, "last_user_id": last_user_id, "processed": processed})
+
+                rate = processed_now / (time.perf_counter() - started)
+                print(f"{processed} usuários processados ({rate:.1f} usuários/s)")
+    finally:
+        db.close()
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    return processed, rate
+
+
+def color_lut_report(path: str, samples: int) -> dict:
+    """Erro da tabela quantizada em relação à função exata"""
+    return tolerance_report(RecommendationEngine(), ColorLUT(path), samples)
+
+
 def main():
-    print("Hello from backend!")
+    parser = argparse.ArgumentParser(description="Tarefas de manutenção do backend Closet.IA")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill = subparsers.add_parser(
+        "backfill-color-features",
+        help="Pré-calcula as features de cor e o encaixe nas paletas das peças existentes"
+    )
+    backfill.add_argument("--batch-size", type=int, default=500)
+
+    build_lut = subparsers.add_parser(
+        "build-color-lut",
+        help="Gera a tabela de compatibilidade entre cores quantizadas (12 bits)"
+    )
+    build_lut.add_argument("--output", default=settings.COLOR_LUT_PATH)
+
+    lut_report = subparsers.add_parser(
+        "color-lut-report",
+        help="Compara a tabela de cores com o cálculo exato"
+    )
+    lut_report.add_argument("--path", default=settings.COLOR_LUT_PATH)
+    lut_report.add_argument("--samples", type=int, default=20000)
+
+    precompute = subparsers.add_parser(
+        "precompute-outfits",
+        help="Pré-calcula os looks do dia de todos os usuários"
+    )
+    precompute.add_argument("--chunk-size", type=int, default=200)
+    precompute.add_argument("--workers", type=int, default=settings.IMAGE_WORKERS)
+    precompute.add_argument("--top-k", type=int, default=5)
+    precompute.add_argument("--weather", nargs="+", default=PRECOMPUTE_WEATHER)
+    precompute.add_argument("--occasion", nargs="+", default=PRECOMPUTE_OCCASIONS)
+    precompute.add_argument("--checkpoint", default=PRECOMPUTE_CHECKPOINT)
+    precompute.add_argument("--restart", action="store_true", help="Ignora o checkpoint e recomeça do zero")
+
+    args = parser.parse_args()
+    init_db()  # aplica as migrações antes de qualquer tarefa
+
+    if args.command == "backfill-color-features":
+        updated = backfill_color_features(args.batch_size)
+        print(f"{updated} peças atualizadas")
+    elif args.command == "build-color-lut":
+        size = build_color_lut(RecommendationEngine(), args.output)
+        print(f"Tabela gravada em {args.output} ({size / (1024 * 1024):.1f}MB)")
+    elif args.command == "precompute-outfits":
+        users, rate = precompute_outfits(
+            args.chunk_size, args.workers, args.top_k, args.weather, args.occasion,
+            args.checkpoint, args.restart
+        )
+        print(f"{users} usuários com looks pré-calculados ({rate:.1f} usuários/s)")
+    elif args.command == "color-lut-report":
+        print(json.dumps(color_lut_report(args.path, args.samples), indent=2))
 
 
 if __name__ == "__main__":
@@ -65,6 +65,7 @@ class ClothingItem(Base):
 
     color = Column(String)
     color_hex = Column(String)
+    color_family = Column(String, nullable=True, index=True)  # família canônica (services.color_names)
     fabric = Column(String, nullable=True)
     brand = Column(String, nullable=True)
     price = Column(Float, nullable=True)
@@ -136,6 +137,42 @@ class ChatMessage(Base):
 
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class ImageBlob(Base):
+    __tablename__ = "image_blobs"
+
+    sha256 = Column(String, primary_key=True)
+    stored_name = Column(String)
+    content_type = Column(String)
+    size = Column(Integer)
+
+    ref_count = Column(Integer, default=0)
+    features = Column(JSON, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class WardrobeVersion(Base):
+    __tablename__ = "wardrobe_versions"
+
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, default=0)
+
+class PrecomputedOutfit(Base):
+    __tablename__ = "precomputed_outfits"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    user_id = Column(String, ForeignKey("users.id"), index=True)
+    wardrobe_version = Column(Integer)
+
+    weather = Column(String)
+    occasion = Column(String)
+    temperature_bucket = Column(String)
+    top_k = Column(Integer)
+
+    outfits = Column(JSON)
+    search_stats = Column(JSON)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class SecurityAudit(Base):
     __tablename__ = "security_audit"
 
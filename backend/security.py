@@ -1,21 +1,39 @@
 import secrets
 import string
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from itsdangerous import URLSafeTimedSerializer
 from fastapi import HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
 import hashlib
 import hmac
+import threading
+import time
+from collections import OrderedDict
 
 from config import settings
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from services.cache import TTLCache
+from services.counter_store import MemoryCounterStore, create_counter_store
+
+# min/max iguais ao custo configurado: hashes com outro custo são refeitos no login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
 
 csrf_serializer = URLSafeTimedSerializer(settings.CSRF_SECRET_KEY)
 
+# Claims de access tokens já verificados, por hash do token; cada entrada expira no `exp` do token
+verified_token_cache = TTLCache(settings.TOKEN_CACHE_SIZE, settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+# jti de access tokens de sessões encerradas, até o token expirar sozinho
+revoked_token_jtis = TTLCache(settings.TOKEN_CACHE_SIZE, settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 class TokenSecurity(HTTPBearer):
     """Enhanced token security with CSRF protection"""
 
@@ -32,7 +50,7 @@ class TokenSecurity(HTTPBearer):
                 detail="Token de autenticação não fornecido"
             )
 
-        token_data = verify_access_token(credentials.credentials)
+        token_data = verify_access_token_cached(credentials.credentials)
         if not token_data:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -55,58 +73,63 @@ class TokenSecurity(HTTPBearer):
 
         return token_data
 
+def _password_bytes(password: str) -> bytes:
+    """bcrypt only uses the first 72 bytes"""
+    return password.encode('utf-8')[:72]
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     try:
-        return pwd_context.verify(plain_password, hashed_password)
+        return pwd_context.verify(_password_bytes(plain_password), hashed_password)
     except Exception:
         return False
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password; also returns a new hash when the stored one uses another work factor"""
+    try:
+        return pwd_context.verify_and_update(_password_bytes(plain_password), hashed_password)
+    except Exception:
+        return False, None
+
 def get_password_hash(password: str) -> str:
     """Get password hash with bcrypt"""
-    encoded_password = password.encode('utf-8')
-    if len(encoded_password) > 72:
-        encoded_password = encoded_password[:72]
-    return pwd_context.hash(encoded_password)
+    return pwd_context.hash(_password_bytes(password))
 
 def generate_secure_password(length: int = 12) -> str:
     """Generate a secure random password"""
     alphabet = string.ascii_letters + string.digits + string.punctuation
     return ''.join(secrets.choice(alphabet) for _ in range(length))
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    """Create JWT access token"""
-    to_encode = data.copy()
-
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-
-    to_encode.update({
-        "exp": expire,
-        "iat": datetime.utcnow(),
-        "type": "access",
+def _issue_token(data: dict, token_type: str, expires_delta: timedelta) -> Tuple[str, Dict[str, Any]]:
+    issued_at = int(time.time())
+    claims = data.copy()
+    claims.update({
+        "exp": issued_at + int(expires_delta.total_seconds()),
+        "iat": issued_at,
+        "type": token_type,
         "jti": secrets.token_urlsafe(32)  # Unique token ID for replay protection
     })
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM), claims
+
+def issue_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> Tuple[str, Dict[str, Any]]:
+    """Create JWT access token; returns the token and its claims, no decode needed"""
+    token, claims = _issue_token(
+        data, "access", expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    verified_token_cache.set(hashlib.sha256(token.encode()).digest(), claims, claims["exp"] - claims["iat"])
+    return token, claims
+
+def issue_refresh_token(data: dict) -> Tuple[str, Dict[str, Any]]:
+    """Create JWT refresh token; returns the token and its claims"""
+    return _issue_token(data, "refresh", timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS))
 
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    """Create JWT access token"""
+    return issue_access_token(data, expires_delta)[0]
 
 def create_refresh_token(data: dict) -> str:
     """Create JWT refresh token"""
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-
-    to_encode.update({
-        "exp": expire,
-        "iat": datetime.utcnow(),
-        "type": "refresh",
-        "jti": secrets.token_urlsafe(32)
-    })
-
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    return issue_refresh_token(data)[0]
 
 def verify_access_token(token: str) -> Optional[Dict[str, Any]]:
     """Verify JWT access token"""
@@ -126,6 +149,35 @@ def verify_access_token(token: str) -> Optional[Dict[str, Any]]:
     except JWTError:
         return None
 
+def verify_access_token_cached(token: str) -> Optional[Dict[str, Any]]:
+    """verify_access_token with an LRU of verified claims keyed by the token hash"""
+    key = hashlib.sha256(token.encode()).digest()
+    payload = verified_token_cache.get(key)
+    if payload is None:
+        payload = verify_access_token(token)
+        if not payload:
+            return None
+        ttl = payload["exp"] - time.time()
+        if ttl > 0:
+            verified_token_cache.set(key, payload, ttl)
+
+    if revoked_token_jtis.get(payload["jti"]):
+        verified_token_cache.pop(key)
+        return None
+    return payload
+
+def invalidate_access_tokens(*jtis: Optional[str]):
+    """Revoke access tokens by jti (logout, session revoke, refresh).
+
+    Only this process's caches learn about the revocation. Another worker that
+    already has the jti in `services.sessions.session_cache` keeps accepting
+    the token until that entry expires, i.e. for up to SESSION_CACHE_TTL
+    seconds; after that the session lookup hits the database and rejects it.
+    """
+    for jti in jtis:
+        if jti:
+            revoked_token_jtis.set(jti, True)
+
 def verify_refresh_token(token: str) -> Optional[Dict[str, Any]]:
     """Verify JWT refresh token"""
     try:
@@ -224,28 +276,191 @@ def get_security_headers() -> Dict[str, str]:
         "Permissions-Policy": "camera=(), microphone=(), geolocation=()"
     }
 
-class RateLimiter:
-    """Simple in-memory rate limiter for demo purposes"""
-
-    def __init__(self, requests_per_minute: int = 60):
-        self.requests_per_minute = requests_per_minute
-        self.requests = {}
+class _KeyWindow:
+    """Estado local de uma chave na janela atual"""
+    __slots__ = ("window", "granted", "previous", "known_previous", "denied_until", "fallback_reserved")
 
-    def is_allowed(self, key: str) -> bool:
-        now = datetime.utcnow()
-        minute_ago = now - timedelta(minutes=1)
+    def __init__(self, window: int):
+        self.window = window
+        self.granted = 0  # requisições já reservadas no backend e ainda não usadas
+        self.previous = 0  # total da janela anterior (todos os workers)
+        self.known_previous = False
+        self.denied_until = 0.0
+        self.fallback_reserved = 0  # reservas feitas só localmente com o backend fora
 
-        self.requests = {
-            k: v for k, v in self.requests.items()
-            if v > minute_ago
-        }
-
-        recent_requests = sum(1 for t in self.requests.values() if t > minute_ago)
-
-        if recent_requests >= self.requests_per_minute:
-            return False
+class RateLimiter:
+    """Per-key sliding window rate limiter with named limits.
+
+    Each key counts requests in fixed windows; the previous window is
+    weighted by how much of it still overlaps the sliding window.
+
+    Counts live in a counter store shared by the workers (see
+    services.counter_store). A worker reserves a lease of requests at a time
+    (`lease_fraction` of the limit, one store round trip) and answers from it
+    locally until it runs out, so the limit holds across workers without a
+    round trip per request. Unused leases are given back in the next batch and
+    denials are cached for `deny_cache` seconds. Idle keys are evicted lazily
+    from the front of a per-limit LRU (OrderedDict); all state is guarded by a
+    lock, so checks from threadpool handlers are safe.
+    """
+
+    def __init__(self, limits: Dict[str, tuple], store=None, lease_fraction: float = 0.05,
+                 deny_cache: float = 0.25, max_keys: int = 100_000):
+        self.limits = limits  # nome -> (requisições, período em segundos)
+        self.store = store or MemoryCounterStore()
+        self.lease_fraction = lease_fraction
+        self.deny_cache = deny_cache
+        self.max_keys = max_keys
+        self.windows: Dict[str, OrderedDict] = {name: OrderedDict() for name in limits}
+        self.returns: Dict[str, tuple] = {}  # devoluções pendentes: chave no backend -> (quantidade, ttl)
+        self.lock = threading.Lock()
+        self.leases = 0
+        self.sync_errors = 0
+
+    def is_allowed(self, key: str, limit: str = "global") -> bool:
+        request = self._check_local(key, limit)
+        return request if isinstance(request, bool) else self._lease(*request)
+
+    async def is_allowed_async(self, key: str, limit: str = "global") -> bool:
+        """is_allowed for async code: only the store round trip leaves the event loop"""
+        request = self._check_local(key, limit)
+        if isinstance(request, bool):
+            return request
+        if isinstance(self.store, MemoryCounterStore):
+            return self._lease(*request)
+        return await run_in_threadpool(self._lease, *request)
+
+    def _check_local(self, key: str, limit: str):
+        """Decide from the local lease (bool) or return the arguments for `_lease`"""
+        max_requests, period = self.limits[limit]
+        now = time.time()
+        window = int(now // period)
+        lease = max(1, int(max_requests * self.lease_fraction))
+
+        with self.lock:
+            windows = self.windows[limit]
+            self._evict(limit, windows, window)
+
+            state = windows.get(key)
+            if state is None:
+                state = windows[key] = _KeyWindow(window)
+            else:
+                windows.move_to_end(key)
+
+            if state.window != window:
+                self._roll(limit, key, state, window)
+
+            if state.granted > 0:
+                state.granted -= 1
+                return True
+            if now < state.denied_until:
+                return False
+
+            current_key = self._storage_key(limit, key, window)
+            increments, self.returns = self.returns, {}
+            returned, _ = increments.get(current_key, (0, 0))
+            increments[current_key] = (returned + lease, 2 * period)
+            reads = [] if state.known_previous else [self._storage_key(limit, key, window - 1)]
+        return limit, key, window, lease, now, current_key, increments, reads
+
+    def _lease(self, limit: str, key: str, window: int, lease: int, now: float, current_key: str,
+               increments: Dict[str, tuple], reads: List[str]) -> bool:
+        """Reserve a lease in the store (one round trip) and decide with it"""
+        max_requests, period = self.limits[limit]
+        try:
+            totals = self.store.sync(increments, reads)
+        except Exception:
+            return self._fallback(limit, key, window, lease, increments, now)
+
+        with self.lock:
+            self.leases += 1
+            state = self.windows[limit].get(key)
+            if state is None or state.window != window:
+                self._give_back(current_key, lease - 1, period)
+                return True
 
-        self.requests[key] = now
-        return True
+            if reads:
+                state.previous = totals[reads[0]]
+                state.known_previous = True
+
+            capacity = max_requests - state.previous * (1 - (now % period) / period)
+            reserved_before = totals[current_key] - lease
+            granted = int(min(lease, max(0, capacity - reserved_before)))
+            if granted < lease:
+                self._give_back(current_key, lease - granted, period)
+            if granted == 0:
+                state.denied_until = now + self.deny_cache
+                return False
+
+            state.granted += granted - 1
+            return True
+
+    def _fallback(self, limit: str, key: str, window: int, lease: int, increments: Dict[str, tuple],
+                  now: float) -> bool:
+        """Backend fora: limita só com as reservas deste worker e reenvia tudo depois"""
+        max_requests, period = self.limits[limit]
+        with self.lock:
+            self.sync_errors += 1
+            for storage_key, (amount, ttl) in increments.items():
+                pending, _ = self.returns.get(storage_key, (0, ttl))
+                self.returns[storage_key] = (pending + amount, ttl)
+
+            state = self.windows[limit].get(key)
+            if state is None or state.window != window:
+                return True
 
-rate_limiter = RateLimiter()
\ No newline at end of file
+            capacity = max_requests - state.previous * (1 - (now % period) / period)
+            if state.fallback_reserved + lease > capacity:
+                state.denied_until = now + self.deny_cache
+                return False
+            state.fallback_reserved += lease
+            state.granted += lease - 1
+            return True
+
+    def _storage_key(self, limit: str, key: str, window: int) -> str:
+        return f"rl:{limit}:{key}:{window}"
+
+    def _give_back(self, storage_key: str, amount: int, period: int):
+        if amount > 0:
+            pending, _ = self.returns.get(storage_key, (0, 2 * period))
+            self.returns[storage_key] = (pending - amount, 2 * period)
+
+    def _roll(self, limit: str, key: str, state: _KeyWindow, window: int):
+        """Passa a chave para a nova janela devolvendo o lease que sobrou da anterior"""
+        period = self.limits[limit][1]
+        self._give_back(self._storage_key(limit, key, state.window), state.granted, period)
+        state.window = window
+        state.granted = 0
+        state.previous = 0
+        state.known_previous = False
+        state.denied_until = 0.0
+        state.fallback_reserved = 0
+
+    def _evict(self, limit: str, windows: OrderedDict, window: int):
+        period = self.limits[limit][1]
+        while windows:
+            key, state = next(iter(windows.items()))
+            if state.window >= window - 1 and len(windows) < self.max_keys:
+                break
+            self._give_back(self._storage_key(limit, key, state.window), state.granted, period)
+            del windows[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "backend": type(self.store).__name__,
+                "keys": {name: len(windows) for name, windows in self.windows.items()},
+                "leases": self.leases,
+                "sync_errors": self.sync_errors
+            }
+
+rate_limiter = RateLimiter(
+    {
+        "global": (settings.RATE_LIMIT_REQUESTS, settings.RATE_LIMIT_PERIOD),
+        "login": (settings.LOGIN_RATE_LIMIT_REQUESTS, settings.LOGIN_RATE_LIMIT_PERIOD),
+        "upload": (settings.UPLOAD_RATE_LIMIT_REQUESTS, settings.UPLOAD_RATE_LIMIT_PERIOD)
+    },
+    store=create_counter_store(settings.RATE_LIMIT_BACKEND, settings.RATE_LIMIT_STORE_URL),
+    lease_fraction=settings.RATE_LIMIT_LEASE_FRACTION,
+    deny_cache=settings.RATE_LIMIT_DENY_CACHE
+)
@@ -0,0 +1,69 @@
+import copy
+from typing import Dict, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import ImageBlob
+from services.upload_stream import StoredUpload
+
+def blob_url(blob: ImageBlob) -> str:
+    return f"/uploads/{blob.stored_name}"
+
+def _url_sha256(image_url: str) -> str:
+    return image_url.rsplit("/", 1)[-1].split(".")[0]
+
+def blob_for_url(db: Session, image_url: Optional[str]) -> Optional[ImageBlob]:
+    """Blob referenciado por uma `image_url` (None para uploads anteriores ao hash)"""
+    if not image_url:
+        return None
+    return db.query(ImageBlob).filter(ImageBlob.sha256 == _url_sha256(image_url)).first()
+
+def cached_features(db: Session, sha256: str) -> Optional[Dict]:
+    """Features já extraídas para este conteúdo, se houver"""
+    blob = db.query(ImageBlob).filter(ImageBlob.sha256 == sha256).first()
+    if blob is None or blob.features is None:
+        return None
+    return copy.deepcopy(blob.features)
+
+def _add_references(db: Session, sha256: str, delta: int) -> bool:
+    """ref_count += delta no próprio SQL; False se o blob não existe"""
+    updated = db.query(ImageBlob).filter(ImageBlob.sha256 == sha256).update(
+        {ImageBlob.ref_count: ImageBlob.ref_count + delta}
+    )
+    return updated > 0
+
+def acquire_blob(db: Session, upload: StoredUpload) -> Tuple[ImageBlob, bool]:
+    """Soma uma referência ao blob do upload, criando o registro se for novo.
+
+    O incremento é atômico no banco e a criação tolera outro upload simultâneo
+    do mesmo conteúdo: quem perde a corrida pelo INSERT só incrementa.
+    """
+    created = False
+    if not _add_references(db, upload.sha256, 1):
+        try:
+            with db.begin_nested():
+                db.add(ImageBlob(
+                    sha256=upload.sha256,
+                    stored_name=upload.stored_name,
+                    content_type=upload.content_type,
+                    size=upload.size,
+                    ref_count=1
+                ))
+            created = True
+        except IntegrityError:
+            _add_references(db, upload.sha256, 1)
+
+    blob = db.query(ImageBlob).filter(ImageBlob.sha256 == upload.sha256).populate_existing().one()
+    return blob, created
+
+def release_blob(db: Session, image_url: Optional[str]) -> bool:
+    """Tira uma referência; True quando o arquivo não é mais usado por nenhuma peça"""
+    if not image_url:
+        return False
+
+    sha256 = _url_sha256(image_url)
+    if not _add_references(db, sha256, -1):
+        return True
+
+    deleted = db.query(ImageBlob).filter(ImageBlob.sha256 == sha256, ImageBlob.ref_count <= 0).delete()
+    return deleted > 0
@@ -0,0 +1,92 @@
+import os
+import random
+from typing import Dict, Tuple
+
+import numpy as np
+
+LUT_BITS = 4  # bits por canal → cores de 12 bits
+LUT_LEVELS = 1 << LUT_BITS
+LUT_COLORS = LUT_LEVELS ** 3
+LUT_SCALE = 10000  # score gravado como inteiro (uint16) com 4 casas
+LUT_THRESHOLD = int(0.6 * LUT_SCALE)  # compatível ⇔ score > 0.6
+BUILD_CHUNK = 256
+
+def quantize(rgb: np.ndarray) -> np.ndarray:
+    """Código de 12 bits (RRRRGGGGBBBB) para um array (N, 3) de RGB 0-255"""
+    rgb = np.asarray(rgb, dtype=np.int64) >> (8 - LUT_BITS)
+    return (rgb[..., 0] << (2 * LUT_BITS)) | (rgb[..., 1] << LUT_BITS) | rgb[..., 2]
+
+def representative_colors() -> list:
+    """Hex do centro de cada célula da quantização, na ordem dos códigos"""
+    step = 256 // LUT_LEVELS
+    levels = [level * step + step // 2 for level in range(LUT_LEVELS)]
+    return [f"#{r:02X}{g:02X}{b:02X}" for r in levels for g in levels for b in levels]
+
+def build_color_lut(engine, path: str, chunk: int = BUILD_CHUNK) -> int:
+    """Grava em `path` (.npy) a tabela 4096x4096 de scores entre cores quantizadas.
+
+    Cada célula usa o score exato entre as cores representativas; a matriz é
+    calculada em faixas de `chunk` linhas para não alocar a tabela em float.
+    """
+    colors = representative_colors()
+    features = [engine.compute_color_features(color) for color in colors]
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.part"
+    table = np.lib.format.open_memmap(temp_path, mode="w+", dtype=np.uint16, shape=(LUT_COLORS, LUT_COLORS))
+    for start in range(0, LUT_COLORS, chunk):
+        _, scores = engine.color_compatibility_matrix(features[start:start + chunk], features)
+        table[start:start + chunk] = np.rint(scores * LUT_SCALE).astype(np.uint16)
+    table.flush()
+    del table
+    os.replace(temp_path, path)
+
+    return os.path.getsize(path)
+
+class ColorLUT:
+    """Tabela de compatibilidade pré-calculada, mapeada em memória (somente leitura).
+
+    Processos que abrem o mesmo arquivo compartilham as páginas do page cache;
+    consultar um par é apenas um acesso ao array.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.table = np.load(path, mmap_mode="r")
+        if self.table.shape != (LUT_COLORS, LUT_COLORS):
+            raise ValueError(f"Tabela de cores com formato inválido: {self.table.shape}")
+
+    def lookup(self, codes_a: np.ndarray, codes_b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(compatível, score) NxM para os códigos de 12 bits informados"""
+        raw = self.table[np.asarray(codes_a)[:, None], np.asarray(codes_b)[None, :]]
+        return raw > LUT_THRESHOLD, raw.astype(np.float64) / LUT_SCALE
+
+    def pair(self, code_a: int, code_b: int) -> Tuple[bool, float]:
+        raw = int(self.table[code_a, code_b])
+        return raw > LUT_THRESHOLD, raw / LUT_SCALE
+
+def tolerance_report(engine, lut: ColorLUT, samples: int = 20000, seed: int = 0) -> Dict:
+    """Compara a tabela com `color_compatibility` exato em pares RGB aleatórios"""
+    rng = random.Random(seed)
+    errors = np.zeros(samples, dtype=np.float64)
+    flag_mismatches = 0
+
+    for index in range(samples):
+        rgb_a = [rng.randrange(256) for _ in range(3)]
+        rgb_b = [rng.randrange(256) for _ in range(3)]
+        exact_ok, exact_score = engine.color_compatibility(
+            "#{:02X}{:02X}{:02X}".format(*rgb_a), "#{:02X}{:02X}{:02X}".format(*rgb_b)
+        )
+        lut_ok, lut_score = lut.pair(int(quantize(rgb_a)), int(quantize(rgb_b)))
+
+        errors[index] = abs(exact_score - lut_score)
+        if exact_ok != lut_ok:
+            flag_mismatches += 1
+
+    return {
+        "samples": samples,
+        "max_abs_error": round(float(errors.max()), 4),
+        "mean_abs_error": round(float(errors.mean()), 4),
+        "p99_abs_error": round(float(np.percentile(errors, 99)), 4),
+        "flag_mismatch_rate": round(flag_mismatches / samples, 4)
+    }
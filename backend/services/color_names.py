@@ -0,0 +1,99 @@
+from typing import Optional
+
+import numpy as np
+
+from services.color_lut import quantize, representative_colors
+from services.color_space import hex_to_lab, parse_hex_colors
+
+# (nome, hex, família canônica)
+NAMED_COLORS = [
+    ("black", "#000000", "black"),
+    ("charcoal", "#36454F", "gray"),
+    ("gray", "#808080", "gray"),
+    ("silver", "#C0C0C0", "gray"),
+    ("white", "#FFFFFF", "white"),
+    ("ivory", "#FFFFF0", "white"),
+    ("cream", "#FFFDD0", "beige"),
+    ("beige", "#F5F5DC", "beige"),
+    ("khaki", "#C3B091", "beige"),
+    ("camel", "#C19A6B", "brown"),
+    ("tan", "#D2B48C", "beige"),
+    ("brown", "#8B4513", "brown"),
+    ("chocolate", "#5C3317", "brown"),
+    ("red", "#FF0000", "red"),
+    ("burgundy", "#800020", "red"),
+    ("maroon", "#800000", "red"),
+    ("coral", "#FF7F50", "orange"),
+    ("orange", "#FFA500", "orange"),
+    ("mustard", "#FFDB58", "yellow"),
+    ("yellow", "#FFFF00", "yellow"),
+    ("gold", "#FFD700", "yellow"),
+    ("olive", "#808000", "green"),
+    ("green", "#008000", "green"),
+    ("lime", "#32CD32", "green"),
+    ("mint", "#98FB98", "green"),
+    ("teal", "#008080", "blue"),
+    ("turquoise", "#40E0D0", "blue"),
+    ("light blue", "#ADD8E6", "blue"),
+    ("blue", "#1F4E99", "blue"),
+    ("royal blue", "#4169E1", "blue"),
+    ("navy", "#000080", "navy"),
+    ("dark blue", "#1C2E4A", "navy"),
+    ("purple", "#800080", "purple"),
+    ("lavender", "#E6E6FA", "purple"),
+    ("pink", "#FFC0CB", "pink"),
+    ("hot pink", "#FF69B4", "pink"),
+    ("magenta", "#FF00FF", "pink")
+]
+
+# Nomes livres enviados pelo cliente → família
+COLOR_ALIASES = {
+    "preto": "black", "preta": "black",
+    "branco": "white", "branca": "white", "off-white": "white",
+    "cinza": "gray", "grey": "gray", "chumbo": "gray", "prata": "gray",
+    "bege": "beige", "nude": "beige", "creme": "beige", "caqui": "beige",
+    "marrom": "brown", "caramelo": "brown",
+    "vermelho": "red", "vermelha": "red", "vinho": "red", "bordo": "red", "bordô": "red",
+    "laranja": "orange",
+    "amarelo": "yellow", "amarela": "yellow", "mostarda": "yellow", "dourado": "yellow",
+    "verde": "green", "oliva": "green",
+    "azul": "blue", "jeans": "blue", "azul marinho": "navy", "marinho": "navy",
+    "roxo": "purple", "roxa": "purple", "lilás": "purple", "lilas": "purple",
+    "rosa": "pink", "pink": "pink"
+}
+
+COLOR_FAMILIES = sorted({family for _, _, family in NAMED_COLORS})
+NEUTRAL_FAMILIES = ("black", "white", "gray", "beige", "navy")
+
+def _build_family_table() -> np.ndarray:
+    """Família (índice em COLOR_FAMILIES) mais próxima em CIELAB para cada cor de 12 bits"""
+    named_lab, _ = hex_to_lab([hex_color for _, hex_color, _ in NAMED_COLORS])
+    cell_lab, _ = hex_to_lab(representative_colors())
+    nearest = np.linalg.norm(cell_lab[:, None, :] - named_lab[None, :, :], axis=2).argmin(axis=1)
+
+    families = np.array([COLOR_FAMILIES.index(family) for _, _, family in NAMED_COLORS], dtype=np.uint8)
+    return families[nearest]
+
+_FAMILY_TABLE = _build_family_table()
+_NAME_FAMILIES = {**{name: family for name, _, family in NAMED_COLORS}, **COLOR_ALIASES}
+
+def family_for_hex(color_hex: str) -> Optional[str]:
+    """Família da cor nomeada mais próxima (consulta numa tabela de 4096 posições)"""
+    rgb, valid = parse_hex_colors([color_hex])
+    if not valid[0]:
+        return None
+    return COLOR_FAMILIES[_FAMILY_TABLE[int(quantize(rgb[0]))]]
+
+def family_for_name(color: Optional[str]) -> Optional[str]:
+    if not color:
+        return None
+    return _NAME_FAMILIES.get(color.strip().lower())
+
+def color_family(color: Optional[str], color_hex: Optional[str] = None) -> Optional[str]:
+    """Família canônica de uma peça: o nome informado, se conhecido, senão o hex mais próximo"""
+    family = family_for_name(color)
+    if family is None and color and color.startswith("#"):
+        family = family_for_hex(color)
+    if family is None and color_hex:
+        family = family_for_hex(color_hex)
+    return family
@@ -0,0 +1,116 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Branco de referência D65 e matriz sRGB → XYZ
+WHITE_D65 = np.array([0.95047, 1.0, 1.08883])
+SRGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041]
+])
+MATCH_DELTA_E = 25.0  # ΔE76 máximo para considerar a cor "da paleta"
+
+def parse_hex_colors(colors: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """(RGB (N, 3) em 0-255, máscara de válidos) para uma lista de hex"""
+    rgb = np.zeros((len(colors), 3), dtype=np.float64)
+    valid = np.zeros(len(colors), dtype=bool)
+    for index, color in enumerate(colors):
+        try:
+            c = color.lstrip('#')
+            rgb[index] = int(c[0:2], 16), int(c[2:4], 16), int(c[4:6], 16)
+            valid[index] = True
+        except Exception:
+            pass
+    return rgb, valid
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """Converte um array (N, 3) de sRGB 0-255 em CIELAB (D65)"""
+    srgb = np.asarray(rgb, dtype=np.float64) / 255
+    linear = np.where(srgb > 0.04045, ((srgb + 0.055) / 1.055) ** 2.4, srgb / 12.92)
+    xyz = linear @ SRGB_TO_XYZ.T / WHITE_D65
+
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    lab = np.empty_like(f)
+    lab[:, 0] = 116 * f[:, 1] - 16
+    lab[:, 1] = 500 * (f[:, 0] - f[:, 1])
+    lab[:, 2] = 200 * (f[:, 1] - f[:, 2])
+    return lab
+
+def hex_to_lab(colors: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    rgb, valid = parse_hex_colors(colors)
+    return rgb_to_lab(rgb), valid
+
+class PaletteIndex:
+    """Índice de vizinho mais próximo (ΔE76) sobre as paletas e listas de cores a evitar.
+
+    As paletas têm poucas dezenas de cores, então a busca é uma matriz de
+    distâncias N x P calculada de uma vez para todas as peças.
+    """
+
+    def __init__(self, palettes: Dict[str, List[str]], avoid: Dict[str, List[str]]):
+        self.seasons = sorted(set(palettes) | set(avoid))
+        self.colors: List[str] = []
+        season_codes, avoid_flags = [], []
+        for code, season in enumerate(self.seasons):
+            for is_avoid, colors in ((False, palettes.get(season, [])), (True, avoid.get(season, []))):
+                self.colors.extend(colors)
+                season_codes.extend([code] * len(colors))
+                avoid_flags.extend([is_avoid] * len(colors))
+
+        self.lab, _ = hex_to_lab(self.colors)
+        self.season_codes = np.array(season_codes)
+        self.avoid_flags = np.array(avoid_flags, dtype=bool)
+
+    def _nearest(self, distances: np.ndarray, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        masked = np.where(mask[None, :], distances, np.inf)
+        index = masked.argmin(axis=1)
+        return index, masked[np.arange(len(masked)), index]
+
+    def match(self, colors: List[str], seasons: Optional[List[str]] = None) -> List[Dict]:
+        """Para cada cor, a cor mais próxima da paleta e da lista a evitar de cada temporada"""
+        lab, valid = hex_to_lab(colors)
+        distances = np.linalg.norm(lab[:, None, :] - self.lab[None, :, :], axis=2)
+
+        results = [{} for _ in colors]
+        for season in seasons or self.seasons:
+            if season not in self.seasons:
+                continue
+            in_season = self.season_codes == self.seasons.index(season)
+            fit_index, fit_distance = self._nearest(distances, in_season & ~self.avoid_flags)
+            avoid_index, avoid_distance = self._nearest(distances, in_season & self.avoid_flags)
+
+            fits = (fit_distance <= MATCH_DELTA_E) & (fit_distance <= avoid_distance)
+            clashes = (avoid_distance <= MATCH_DELTA_E) & (avoid_distance < fit_distance)
+
+            for row in np.flatnonzero(valid):
+                nearest_fit = bool(np.isfinite(fit_distance[row]))
+                nearest_avoid = bool(np.isfinite(avoid_distance[row]))
+                results[row][season] = {
+                    "status": "fits" if fits[row] else "avoid" if clashes[row] else "neutral",
+                    "nearest": self.colors[fit_index[row]] if nearest_fit else None,
+                    "delta_e": round(float(fit_distance[row]), 2) if nearest_fit else None,
+                    "nearest_avoid": self.colors[avoid_index[row]] if nearest_avoid else None,
+                    "avoid_delta_e": round(float(avoid_distance[row]), 2) if nearest_avoid else None
+                }
+        return results
+
+def summarize_palette_fit(items: List[Dict], season: str) -> Dict:
+    """Agrega o `palette_fit` gravado nas peças para uma temporada"""
+    counts = {"fits": 0, "avoid": 0, "neutral": 0}
+    pieces = {"fits": [], "avoid": []}
+    for item in items:
+        fit = (item.get("palette_fit") or {}).get(season)
+        if fit is None:
+            continue
+        counts[fit["status"]] += 1
+        if fit["status"] in pieces:
+            pieces[fit["status"]].append(item["id"])
+
+    return {
+        "season": season,
+        "counts": counts,
+        "fitting_items": pieces["fits"],
+        "avoid_items": pieces["avoid"],
+        "summary": f"{counts['fits']} das suas peças combinam com a paleta {season}"
+    }
@@ -0,0 +1,205 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# incrementos: chave -> (quantidade, ttl em segundos)
+Increments = Dict[str, Tuple[int, int]]
+
+class CounterStoreError(Exception):
+    """Backend de contadores indisponível"""
+
+class MemoryCounterStore:
+    """Contadores no próprio processo (um único worker)"""
+
+    def __init__(self):
+        self.counters: Dict[str, list] = {}
+        self.lock = threading.Lock()
+        self.syncs = 0
+
+    def sync(self, increments: Increments, reads: List[str]) -> Dict[str, int]:
+        """Aplica os incrementos e retorna o total atual de cada chave tocada ou lida"""
+        now = time.time()
+        with self.lock:
+            self.syncs += 1
+            if self.syncs % 100 == 0:
+                self.counters = {key: entry for key, entry in self.counters.items() if entry[1] >= now}
+
+            for key, (amount, ttl) in increments.items():
+                entry = self.counters.get(key)
+                if entry is None or entry[1] < now:
+                    entry = self.counters[key] = [0, 0.0]
+                entry[0] += amount
+                entry[1] = now + ttl
+
+            totals = {}
+            for key in list(increments) + reads:
+                entry = self.counters.get(key)
+                totals[key] = entry[0] if entry and entry[1] >= now else 0
+            return totals
+
+    def close(self):
+        pass
+
+class SQLiteCounterStore:
+    """Contadores num arquivo SQLite compartilhado pelos workers do mesmo host"""
+
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.lock = threading.Lock()
+        self.syncs = 0
+
+    def sync(self, increments: Increments, reads: List[str]) -> Dict[str, int]:
+        now = time.time()
+        keys = list(increments) + reads
+        with self.lock:
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.conn.executemany(
+                    "INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET "
+                    "value = CASE WHEN counters.expires_at < ? THEN excluded.value "
+                    "ELSE counters.value + excluded.value END, "
+                    "expires_at = excluded.expires_at",
+                    [(key, amount, now + ttl, now) for key, (amount, ttl) in increments.items()]
+                )
+
+                totals = dict.fromkeys(keys, 0)
+                if keys:
+                    placeholders = ",".join("?" * len(keys))
+                    totals.update(self.conn.execute(
+                        f"SELECT key, value FROM counters WHERE key IN ({placeholders}) AND expires_at >= ?",
+                        keys + [now]
+                    ).fetchall())
+
+                self.syncs += 1
+                if self.syncs % self.PURGE_EVERY == 0:
+                    self.conn.execute("DELETE FROM counters WHERE expires_at < ?", (now,))
+                self.conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                raise CounterStoreError(str(e))
+        return totals
+
+    def close(self):
+        self.conn.close()
+
+class RedisCounterStore:
+    """Contadores num servidor que fala o protocolo do Redis (RESP).
+
+    Aceita `redis://[:senha@]host:porta/db` ou `unix:///caminho/do/socket`;
+    cada sincronização é um único pipeline (INCRBY + EXPIRE por chave, GET
+    para as leituras), ou seja, uma ida e volta de rede.
+    """
+
+    def __init__(self, url: str, timeout: float = 1.0):
+        self.url = urlparse(url)
+        self.timeout = timeout
+        self.sock: Optional[socket.socket] = None
+        self.reader = None
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        if self.url.scheme == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.url.path)
+        else:
+            sock = socket.create_connection((self.url.hostname or "localhost", self.url.port or 6379), self.timeout)
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+
+        setup = []
+        if self.url.password:
+            setup.append(("AUTH", self.url.password))
+        database = self.url.path.lstrip("/") if self.url.scheme != "unix" else ""
+        if database:
+            setup.append(("SELECT", database))
+        if setup:
+            self._execute(setup)
+
+    @staticmethod
+    def _encode(command: tuple) -> bytes:
+        parts = [str(part).encode() for part in command]
+        return b"*%d\r\n" % len(parts) + b"".join(b"$%d\r\n%s\r\n" % (len(part), part) for part in parts)
+
+    def _read_reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Conexão encerrada pelo servidor")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode()
+        if prefix == b"-":
+            raise CounterStoreError(payload.decode())
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2].decode()
+        if prefix == b"*":
+            return [self._read_reply() for _ in range(int(payload))]
+        raise CounterStoreError(f"Resposta RESP inválida: {line!r}")
+
+    def _execute(self, commands: List[tuple]) -> list:
+        self.sock.sendall(b"".join(self._encode(command) for command in commands))
+        return [self._read_reply() for _ in commands]
+
+    def sync(self, increments: Increments, reads: List[str]) -> Dict[str, int]:
+        commands = []
+        for key, (amount, ttl) in increments.items():
+            commands += [("INCRBY", key, amount), ("EXPIRE", key, ttl)]
+        commands += [("GET", key) for key in reads]
+        if not commands:
+            return {}
+
+        with self.lock:
+            try:
+                if self.sock is None:
+                    self._connect()
+                replies = self._execute(commands)
+            except CounterStoreError:
+                self.close()  # respostas restantes do pipeline ficaram no socket
+                raise
+            except (OSError, ConnectionError) as e:
+                self.close()
+                raise CounterStoreError(str(e))
+
+        totals = {key: int(replies[index * 2]) for index, key in enumerate(increments)}
+        for key, reply in zip(reads, replies[len(increments) * 2:]):
+            totals[key] = int(reply or 0)
+        return totals
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.reader = None
+
+def create_counter_store(backend: str, url: str = ""):
+    """memory, sqlite (url = caminho do arquivo) ou redis (url = redis:// ou unix://)"""
+    if backend == "memory":
+        return MemoryCounterStore()
+    if backend == "sqlite":
+        return SQLiteCounterStore(url or "backend/data/counters.db")
+    if backend == "redis":
+        return RedisCounterStore(url or "redis://localhost:6379/0")
+    raise ValueError(f"Backend de contadores desconhecido: {backend}")
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+
+from config import settings
+
+class ImageQueueFull(Exception):
+    """Fila de processamento de imagens cheia"""
+
+class ImageJobTimeout(Exception):
+    """Processamento de imagem excedeu o tempo limite"""
+
+class ImageWorkerPool:
+    """Pool de processos para o trabalho de CPU com imagens (Pillow).
+
+    Mantém o event loop livre durante a análise: os jobs rodam em um
+    `ProcessPoolExecutor`, no máximo `max_pending` ficam em andamento ou na
+    fila e cada um tem `timeout` segundos para terminar. Um job que estoura o
+    tempo continua ocupando sua vaga até o processo realmente terminá-lo.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, timeout: float):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.max_pending
+
+    async def submit(self, fn: Callable, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise ImageQueueFull()
+            self.pending += 1
+
+        try:
+            job = self.executor.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # a vaga só é liberada quando o executor termina (ou cancela) o job
+        job.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(job), self.timeout)
+        except asyncio.TimeoutError:
+            raise ImageJobTimeout()
+
+    def _release(self, job: Optional[Future] = None):
+        with self._lock:
+            self.pending -= 1
+
+    def stats(self) -> Dict:
+        return {"workers": self.max_workers, "pending": self.pending, "max_pending": self.max_pending}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+image_workers = ImageWorkerPool(
+    max_workers=settings.IMAGE_WORKERS,
+    max_pending=settings.IMAGE_QUEUE_SIZE,
+    timeout=settings.IMAGE_JOB_TIMEOUT
+)
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from config import settings
+from database import SessionLocal
+from models import ClothingItem
+from services.blob_store import blob_for_url
+from services.wardrobe import bump_wardrobe_version
+from services.image_workers import ImageQueueFull, ImageJobTimeout
+from services.recommendation_engine import engine as recommendation_engine
+from services.color_names import color_family
+
+def processing_status(item: ClothingItem) -> str:
+    """pending enquanto a análise não gravou `processed_features`"""
+    if item.processed_features is None:
+        return "pending"
+    return "failed" if item.processed_features.get("error") else "ready"
+
+def status_payload(item: ClothingItem) -> Dict:
+    return {
+        "id": item.id,
+        "status": processing_status(item),
+        "color": item.color,
+        "color_hex": item.color_hex,
+        "color_family": item.color_family,
+        "subcategory": item.subcategory
+    }
+
+def fill_analysis(item: ClothingItem, processed_data: Dict,
+                  color: Optional[str] = None, subcategory: Optional[str] = None):
+    """Preenche a peça com o resultado da análise"""
+    processed_data["color_features"] = recommendation_engine.compute_color_features(
+        processed_data.get("color", "#808080")
+    )
+    processed_data["palette_fit"] = recommendation_engine.palette_fit(
+        [processed_data.get("color", "#808080")]
+    )[0]
+
+    item.subcategory = subcategory or processed_data.get("subcategory", "uncategorized")
+    item.color = color or processed_data.get("color", "unknown")
+    item.color_hex = processed_data.get("color", "#808080")
+    item.color_family = color_family(item.color, item.color_hex)
+    item.processed_features = processed_data
+
+async def process_pending_item(item_id: str, file_path: str,
+                               color: Optional[str] = None, subcategory: Optional[str] = None):
+    """Analisa em segundo plano uma peça criada como pending"""
+    try:
+        processed_data = await recommendation_engine.process_clothing_image(file_path)
+    except ImageQueueFull:
+        processed_data = None
+        error = "Fila de análise de imagens cheia"
+    except ImageJobTimeout:
+        processed_data = None
+        error = "Tempo limite excedido ao analisar a imagem"
+    except Exception as e:
+        # pool de processos quebrado, erro inesperado: a peça não pode ficar pending para sempre
+        processed_data = None
+        error = f"Erro ao analisar a imagem: {e}"
+
+    db = SessionLocal()
+    try:
+        item = db.query(ClothingItem).filter(ClothingItem.id == item_id).first()
+        if item is None:
+            return
+
+        if processed_data is not None:
+            try:
+                blob = blob_for_url(db, item.image_url)
+                if blob is not None and blob.features is None:
+                    blob.features = processed_data
+                fill_analysis(item, processed_data, color, subcategory)
+                bump_wardrobe_version(db, item.user_id)
+                db.commit()
+                return
+            except Exception as e:
+                db.rollback()
+                error = f"Erro ao gravar a análise: {e}"
+
+        item.processed_features = {"error": error}
+        db.commit()
+    finally:
+        db.close()
+
+async def resume_pending_items(older_than: float) -> int:
+    """Reanalisa peças que ficaram pending (worker caiu antes da tarefa de fundo rodar).
+
+    Só pega peças criadas há mais de `older_than` segundos, para não repetir a
+    análise que outro worker ainda está fazendo, e processa uma por vez para não
+    encher a fila de imagens.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+    db = SessionLocal()
+    try:
+        pending = db.query(
+            ClothingItem.id, ClothingItem.image_url, ClothingItem.color, ClothingItem.subcategory
+        ).filter(
+            ClothingItem.processed_features.is_(None),
+            ClothingItem.created_at < cutoff
+        ).all()
+    finally:
+        db.close()
+
+    for item_id, image_url, color, subcategory in pending:
+        file_path = image_url.replace("/uploads/", f"{settings.UPLOAD_DIR}/")
+        await process_pending_item(item_id, file_path, None if color == "unknown" else color, subcategory)
+    return len(pending)
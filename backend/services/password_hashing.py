@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List
+
+from config import settings
+
+class PasswordQueueFull(Exception):
+    """Fila de hash de senhas cheia"""
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 2)
+
+class PasswordHashPool:
+    """Pool de threads dedicado ao bcrypt (login, cadastro).
+
+    O bcrypt libera o GIL, então threads bastam; o que importa é o limite:
+    no máximo `max_pending` hashes ficam em andamento ou na fila e o excedente
+    falha na hora com `PasswordQueueFull`, em vez de ocupar o threadpool das
+    rotas comuns.
+    """
+
+    SAMPLES = 1000
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.queue_wait_ms: Deque[float] = deque(maxlen=self.SAMPLES)
+        self.hash_ms: Deque[float] = deque(maxlen=self.SAMPLES)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+
+    def run(self, fn: Callable, *args):
+        """Executa `fn` no pool e espera o resultado (rotas síncronas)"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordQueueFull()
+            self.pending += 1
+
+        submitted = time.perf_counter()
+        try:
+            return self._executor.submit(self._timed, submitted, fn, *args).result()
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def _timed(self, submitted: float, fn: Callable, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            self.queue_wait_ms.append((started - submitted) * 1000)
+            self.hash_ms.append((finished - started) * 1000)
+
+    def stats(self) -> Dict:
+        queue_wait_ms, hash_ms = list(self.queue_wait_ms), list(self.hash_ms)
+        return {
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+            "queue_wait_p50_ms": _percentile(queue_wait_ms, 0.5),
+            "queue_wait_p95_ms": _percentile(queue_wait_ms, 0.95),
+            "hash_p50_ms": _percentile(hash_ms, 0.5),
+            "hash_p95_ms": _percentile(hash_ms, 0.95)
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_hasher = PasswordHashPool(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_QUEUE_SIZE
+)
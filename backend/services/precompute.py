@@ -0,0 +1,61 @@
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+
+from models import PrecomputedOutfit
+from services.recommendation_engine import engine as recommendation_engine, temperature_bucket, COLD_BELOW, HOT_ABOVE
+
+PRECOMPUTE_WEATHER = ["moderate", "rainy", "cold", "hot"]
+PRECOMPUTE_OCCASIONS = ["casual", "work", "formal"]
+# Uma temperatura representativa por faixa de `temperature_bucket`
+TEMPERATURE_POINTS = {"cold": COLD_BELOW - 5, "mild": 24, "hot": HOT_ABOVE + 4}
+
+def outfit_grid(weathers: List[str], occasions: List[str]) -> List[Tuple[str, str, int]]:
+    """Combinações (clima, ocasião, temperatura) pré-calculadas por usuário"""
+    return [
+        (weather, occasion, temperature)
+        for weather in weathers
+        for occasion in occasions
+        for temperature in TEMPERATURE_POINTS.values()
+    ]
+
+def compute_user_outfits(items: List[Dict], grid: List[Tuple[str, str, int]], top_k: int) -> List[Tuple]:
+    """Roda a busca de looks para toda a grade (executa no pool de processos)"""
+    results = []
+    for weather, occasion, temperature in grid:
+        outfits, stats = recommendation_engine.search_outfits(
+            items, weather, occasion, temperature, top_k
+        )
+        results.append((weather, occasion, temperature_bucket(temperature), outfits, stats))
+    return results
+
+def store_user_outfits(db: Session, user_id: str, version: int, top_k: int, results: List[Tuple]):
+    """Substitui os looks pré-calculados do usuário"""
+    db.query(PrecomputedOutfit).filter(PrecomputedOutfit.user_id == user_id).delete(synchronize_session=False)
+    db.add_all([
+        PrecomputedOutfit(
+            user_id=user_id,
+            wardrobe_version=version,
+            weather=weather,
+            occasion=occasion,
+            temperature_bucket=bucket,
+            top_k=top_k,
+            outfits=outfits,
+            search_stats=stats
+        )
+        for weather, occasion, bucket, outfits, stats in results
+    ])
+
+def precomputed_outfits(db: Session, user_id: str, version: int, weather: str, occasion: str,
+                        temperature: int, top_k: int) -> Optional[Tuple[List[Dict], Dict]]:
+    """(looks, estatísticas) pré-calculados, se existirem para a versão atual do guarda-roupa"""
+    row = db.query(PrecomputedOutfit.outfits, PrecomputedOutfit.search_stats, PrecomputedOutfit.top_k).filter(
+        PrecomputedOutfit.user_id == user_id,
+        PrecomputedOutfit.wardrobe_version == version,
+        PrecomputedOutfit.weather == weather,
+        PrecomputedOutfit.occasion == occasion,
+        PrecomputedOutfit.temperature_bucket == temperature_bucket(temperature)
+    ).first()
+
+    if row is None or row.top_k < top_k or row.search_stats.get("truncated"):
+        return None
+    return row.outfits[:top_k], row.search_stats
@@ -1,10 +1,322 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 import colorsys
+import numpy as np
 from PIL import Image
 import os
 import json
 from datetime import datetime
-import random
+import heapq
+import time
+
+from services.image_workers import image_workers
+from services.color_lut import ColorLUT, quantize
+from services.color_space import PaletteIndex, summarize_palette_fit
+from services.color_names import NEUTRAL_FAMILIES, color_family
+
+HUE_BUCKETS = 12
+
+ANALYSIS_SIZE = (300, 300)
+PALETTE_SIZE = 5
+CENTER_SIGMA = 0.5
+
+COLD_BELOW = 15
+HOT_ABOVE = 28
+
+DRESS_BASE_SCORE = 0.85
+OUTFIT_WEIGHTS = {"base": 0.6, "shoes": 0.25, "accessory": 0.15}
+
+CATEGORY_GROUPS = {
+    "top": ["top", "blouse", "shirt", "t-shirt"],
+    "bottom": ["bottom", "pants", "skirt", "jeans"],
+    "dress": ["dress"],
+    "outerwear": ["outerwear"],
+    "shoes": ["shoes"],
+    "accessory": ["accessory"]
+}
+
+SHOPPING_BASICS = {
+    "white_shirt": {"category": "top", "subcategory": "shirt", "color": "white", "color_hex": "#FFFFFF",
+                    "color_families": ("white",)},
+    "black_pants": {"category": "bottom", "subcategory": "pants", "color": "black", "color_hex": "#000000",
+                    "color_families": ("black",)},
+    "blue_jeans": {"category": "bottom", "subcategory": "jeans", "color": "blue", "color_hex": "#1F4E99",
+                   "color_families": ("blue", "navy")},
+    "little_black_dress": {"category": "dress", "subcategory": "dress", "color": "black", "color_hex": "#000000",
+                           "color_families": ("black",)},
+    "neutral_blazer": {"category": "outerwear", "subcategory": "blazer", "color": "neutral", "color_hex": "#C8B89A",
+                       "color_families": NEUTRAL_FAMILIES}
+}
+
+FLAG_WATERPROOF = 1
+FLAG_WARM = 2
+FLAG_LIGHT = 4
+
+ATTRIBUTE_RULES = [
+    ("fabric", ["nylon", "polyester", "waterproof"], FLAG_WATERPROOF),
+    ("category", ["outerwear", "sweater"], FLAG_WARM),
+    ("fabric", ["cotton", "linen", "silk"], FLAG_LIGHT)
+]
+
+def _compile_attribute_rules() -> Dict[str, Dict[str, int]]:
+    """{campo: {valor: bits}} a partir de ATTRIBUTE_RULES"""
+    compiled = {}
+    for field, values, flag in ATTRIBUTE_RULES:
+        table = compiled.setdefault(field, {})
+        for value in values:
+            table[value] = table.get(value, 0) | flag
+    return compiled
+
+_ATTRIBUTE_FLAGS = _compile_attribute_rules()
+_GROUP_NAMES = list(CATEGORY_GROUPS)
+_GROUP_CODES = {
+    category: code for code, group in enumerate(_GROUP_NAMES) for category in CATEGORY_GROUPS[group]
+}
+
+def _category_group(category: Optional[str]) -> Optional[str]:
+    code = _GROUP_CODES.get(category)
+    return None if code is None else _GROUP_NAMES[code]
+
+def _item_flags(item: Dict) -> int:
+    flags = 0
+    for field, table in _ATTRIBUTE_FLAGS.items():
+        flags |= table.get(item.get(field), 0)
+    return flags
+
+def required_weather_flags(weather: str, temperature: int) -> int:
+    """Bits que um look precisa ter para o clima (0 = qualquer look serve)"""
+    if weather == "rainy":
+        return FLAG_WATERPROOF
+    if weather == "cold" or temperature < COLD_BELOW:
+        return FLAG_WARM
+    if weather == "hot" or temperature > HOT_ABOVE:
+        return FLAG_LIGHT
+    return 0
+
+class CompiledWardrobe:
+    """Guarda-roupa codificado uma vez por requisição.
+
+    `groups` guarda o código do grupo de categoria de cada peça (-1 se não
+    tiver grupo) e `flags` o bitmap de atributos (impermeável, quente, leve),
+    de modo que separar por categoria e checar clima vira operação de arrays.
+    """
+
+    def __init__(self, items: List[Dict]):
+        self.items = items
+        self.groups = np.fromiter((_GROUP_CODES.get(i.get("category"), -1) for i in items),
+                                  dtype=np.int8, count=len(items))
+        self.flags = np.fromiter((_item_flags(i) for i in items), dtype=np.uint8, count=len(items))
+
+    def bucket(self, group: str) -> Tuple[List[Dict], np.ndarray]:
+        """Peças do grupo e seus bitmaps"""
+        indexes = np.flatnonzero(self.groups == _GROUP_NAMES.index(group))
+        return [self.items[index] for index in indexes], self.flags[indexes]
+
+def temperature_bucket(temperature: int) -> str:
+    """Faixa de temperatura que `check_weather_suitability` distingue"""
+    if temperature < COLD_BELOW:
+        return "cold"
+    if temperature > HOT_ABOVE:
+        return "hot"
+    return "mild"
+
+def _parse_hex(color_hex) -> Optional[Tuple[int, int, int]]:
+    """Converte '#rrggbb' em RGB com o mesmo parsing de `color_compatibility`"""
+    try:
+        c = color_hex.lstrip('#')
+        return int(c[0:2], 16), int(c[2:4], 16), int(c[4:6], 16)
+    except Exception:
+        return None
+
+def _color_table(colors: List) -> Dict[str, np.ndarray]:
+    """Calcula hue, flag de neutro, código quantizado e validade para uma lista de cores.
+
+    Cada entrada pode ser um hex ou o dict de `compute_color_features`;
+    as features pré-calculadas são usadas sem re-parsing.
+    """
+    hue = np.zeros(len(colors), dtype=np.float64)
+    neutral = np.zeros(len(colors), dtype=bool)
+    valid = np.zeros(len(colors), dtype=bool)
+    code = np.zeros(len(colors), dtype=np.int64)
+
+    pending = []
+    for index, color in enumerate(colors):
+        if isinstance(color, dict):
+            hue[index] = color["hsv"][0]
+            neutral[index] = color["is_neutral"]
+            code[index] = quantize(color["rgb"])
+            valid[index] = True
+        else:
+            parsed = _parse_hex(color)
+            if parsed is not None:
+                pending.append((index, parsed))
+
+    if pending:
+        indexes = np.array([index for index, _ in pending])
+        rgb = np.array([parsed for _, parsed in pending], dtype=np.float64)
+        r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+        pending_hue, saturation = _rgb_to_hue_saturation(rgb / 255)
+        hue[indexes] = pending_hue
+        neutral[indexes] = (saturation < 0.1) | ((np.abs(r - g) < 30) & (np.abs(g - b) < 30))
+        code[indexes] = quantize(rgb)
+        valid[indexes] = True
+
+    return {"hue": hue, "neutral": neutral, "code": code, "valid": valid}
+
+def _rgb_to_hue_saturation(rgb: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Versão vetorizada de `colorsys.rgb_to_hsv` (apenas h e s)"""
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    maxc = rgb.max(axis=1)
+    minc = rgb.min(axis=1)
+    rangec = maxc - minc
+    gray = rangec == 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        saturation = np.where(gray, 0.0, rangec / np.where(maxc == 0, 1, maxc))
+        safe_range = np.where(gray, 1, rangec)
+        rc = (maxc - r) / safe_range
+        gc = (maxc - g) / safe_range
+        bc = (maxc - b) / safe_range
+
+    hue = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    hue = np.where(gray, 0.0, (hue / 6.0) % 1.0)
+    return hue, saturation
+
+class _RankedOptions:
+    """Opções (índice, score) compatíveis de cada linha, em ordem decrescente.
+
+    `best` e `counts` são calculados de uma vez com NumPy; a lista ordenada de
+    uma linha só é montada quando a busca chega nela.
+    """
+
+    def __init__(self, compatible: np.ndarray, scores: np.ndarray, min_score: float = 0.7):
+        self.scores = scores
+        self.eligible = compatible & (scores >= min_score)
+        self.counts = self.eligible.sum(axis=1)
+        self.best = np.where(self.eligible, scores, 0.0).max(axis=1, initial=0.0)
+        self._rows: Dict[int, List[Tuple[int, float]]] = {}
+
+    def __getitem__(self, row: int) -> List[Tuple[int, float]]:
+        options = self._rows.get(row)
+        if options is None:
+            candidates = np.flatnonzero(self.eligible[row])
+            order = candidates[np.argsort(-self.scores[row, candidates], kind="stable")]
+            options = self._rows[row] = [(int(index), float(self.scores[row, index])) for index in order]
+        return options
+
+def _option_counts(compatible: np.ndarray, scores: np.ndarray, min_score: float = 0.7) -> np.ndarray:
+    """Quantos itens cada linha aceita como opção (mesmo critério de `_RankedOptions`)"""
+    return (compatible & (scores >= min_score)).sum(axis=1)
+
+def _select_compatible(item_list: List[Dict], compatible: np.ndarray, scores: np.ndarray,
+                       min_score: float = 0.7) -> List[Dict]:
+    """Filtra e ordena (score desc, estável) os itens de uma linha da matriz"""
+    selected = np.flatnonzero(compatible & (scores >= min_score))
+    selected = selected[np.argsort(-scores[selected], kind="stable")]
+
+    result = []
+    for index in selected:
+        item = item_list[index]
+        item["compatibility_score"] = float(scores[index])
+        result.append(item)
+    return result
+
+def _center_weights(height: int, width: int) -> np.ndarray:
+    """Peso gaussiano por pixel, máximo no centro, para reduzir a influência do fundo"""
+    y = (np.arange(height) - (height - 1) / 2) / max(height / 2, 1)
+    x = (np.arange(width) - (width - 1) / 2) / max(width / 2, 1)
+    return np.exp(-(y[:, None] ** 2 + x[None, :] ** 2) / (2 * CENTER_SIGMA ** 2))
+
+def _extract_palette(pixels: np.ndarray, weights: np.ndarray, k: int = PALETTE_SIZE,
+                     iterations: int = 8) -> List[str]:
+    """K-means ponderado sobre o histograma RGB de 12 bits; cores em ordem de peso"""
+    codes = (pixels[:, 0] >> 4) << 8 | (pixels[:, 1] >> 4) << 4 | pixels[:, 2] >> 4
+    counts = np.bincount(codes, weights=weights, minlength=4096)
+    sums = np.stack([np.bincount(codes, weights=weights * pixels[:, c], minlength=4096) for c in range(3)], axis=1)
+
+    occupied = np.flatnonzero(counts > 0)
+    if occupied.size == 0:
+        return []
+
+    bin_weights = counts[occupied]
+    colors = sums[occupied] / bin_weights[:, None]
+
+    k = min(k, occupied.size)
+    seeds = [int(np.argmax(bin_weights))]
+    distances = ((colors - colors[seeds[0]]) ** 2).sum(axis=1)
+    while len(seeds) < k:
+        seeds.append(int(np.argmax(bin_weights * distances)))
+        distances = np.minimum(distances, ((colors - colors[seeds[-1]]) ** 2).sum(axis=1))
+    centers = colors[seeds].copy()
+    for _ in range(iterations + 1):
+        labels = ((colors[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+        cluster_weights = np.bincount(labels, weights=bin_weights, minlength=k)
+        totals = np.stack([np.bincount(labels, weights=bin_weights * colors[:, c], minlength=k) for c in range(3)], axis=1)
+        filled = cluster_weights > 0
+        centers[filled] = totals[filled] / cluster_weights[filled, None]
+
+    order = np.argsort(-cluster_weights, kind="stable")
+    order = order[cluster_weights[order] > 0]
+    return ['#%02x%02x%02x' % tuple(int(round(v)) for v in centers[index]) for index in order]
+
+def extract_image_features(image_path: str, center_weighted: bool = True) -> Dict:
+    """Processa imagem para extrair características (CPU, roda fora do event loop)"""
+    try:
+        img = Image.open(image_path)
+        if img.format == "JPEG":
+            img.draft("RGB", ANALYSIS_SIZE)
+        img.thumbnail(ANALYSIS_SIZE)
+
+        rgba = np.asarray(img.convert("RGBA"))
+        height, width = rgba.shape[:2]
+        weights = rgba[:, :, 3].astype(np.float64) / 255
+        if center_weighted:
+            weights = weights * _center_weights(height, width)
+
+        color_palette = _extract_palette(rgba[:, :, :3].reshape(-1, 3).astype(np.int64), weights.ravel())
+        if not color_palette:
+            color_palette = ["#808080"]
+        hex_color = color_palette[0]
+
+        width, height = img.size
+        aspect_ratio = width / height
+
+        if aspect_ratio < 0.7:
+            category = "dress"
+            subcategory = "dress"
+        elif aspect_ratio < 0.9:
+            category = "top"
+            subcategory = "blouse" if aspect_ratio > 0.8 else "t-shirt"
+        elif aspect_ratio < 1.2:
+            category = "top"
+            subcategory = "shirt"
+        elif aspect_ratio < 1.5:
+            category = "bottom"
+            subcategory = "skirt"
+        else:
+            category = "bottom"
+            subcategory = "pants"
+
+        return {
+            "color": hex_color,
+            "color_palette": color_palette[:5],
+            "category": category,
+            "subcategory": subcategory,
+            "size": {"width": width, "height": height},
+            "aspect_ratio": aspect_ratio,
+            "dominant_colors": color_palette[:3]
+        }
+
+    except Exception as e:
+        print(f"Erro ao processar imagem: {e}")
+        return {
+            "color": "#808080",
+            "color_palette": ["#808080"],
+            "category": "uncategorized",
+            "subcategory": "uncategorized",
+            "size": {"width": 0, "height": 0},
+            "aspect_ratio": 1.0,
+            "error": str(e)
+        }
 
 class RecommendationEngine:
     def __init__(self):
@@ -14,72 +326,31 @@ class RecommendationEngine:
             "autumn": ["#8B4513", "#D2691E", "#FF8C00", "#556B2F", "#8B7355"],
             "spring": ["#FFE4B5", "#FFD700", "#98FB98", "#87CEEB", "#FF69B4"]
         }
+        self.avoid_palettes = {
+            "winter": ["#D2691E", "#8B4513", "#556B2F"],  # Evitar cores outono
+            "summer": ["#FF8C00", "#8B0000", "#2F4F4F"],  # Evitar cores inverno/outono
+            "autumn": ["#4169E1", "#800080", "#00CED1"],  # Evitar cores inverno/verão
+            "spring": ["#8B0000", "#4B0082", "#2F4F4F"]   # Evitar cores inverno
+        }
+        self.palette_index = PaletteIndex(self.color_seasons, self.avoid_palettes)
+        self.color_lut: Optional[ColorLUT] = None
 
-    async def process_clothing_image(self, image_path: str) -> Dict:
-        """Processa imagem para extrair características"""
-        try:
-            img = Image.open(image_path)
-            img.thumbnail((300, 300))
-
-            colors = img.getcolors(maxcolors=10000)
-            if colors:
-                dominant_color = max(colors, key=lambda x: x[0])[1]
-                hex_color = '#%02x%02x%02x' % dominant_color[:3]
-
-                palette = img.convert('P', palette=Image.ADAPTIVE, colors=5)
-                palette_colors = palette.getpalette()
-                color_palette = []
-                for i in range(0, len(palette_colors), 3):
-                    if i + 2 < len(palette_colors):
-                        color_palette.append(f"#{palette_colors[i]:02x}{palette_colors[i+1]:02x}{palette_colors[i+2]:02x}")
+    def use_color_lut(self, lut: Optional[ColorLUT]):
+        """Passa a consultar a tabela quantizada em vez de calcular cada par"""
+        self.color_lut = lut
 
-            else:
-                hex_color = "#808080"
-                color_palette = [hex_color]
-
-            width, height = img.size
-            aspect_ratio = width / height
-
-            if aspect_ratio < 0.7:
-                category = "dress"
-                subcategory = "dress"
-            elif aspect_ratio < 0.9:
-                category = "top"
-                subcategory = "blouse" if aspect_ratio > 0.8 else "t-shirt"
-            elif aspect_ratio < 1.2:
-                category = "top"
-                subcategory = "shirt"
-            elif aspect_ratio < 1.5:
-                category = "bottom"
-                subcategory = "skirt"
-            else:
-                category = "bottom"
-                subcategory = "pants"
-
-            return {
-                "color": hex_color,
-                "color_palette": color_palette[:5],
-                "category": category,
-                "subcategory": subcategory,
-                "size": {"width": width, "height": height},
-                "aspect_ratio": aspect_ratio,
-                "dominant_colors": color_palette[:3]
-            }
-
-        except Exception as e:
-            print(f"Erro ao processar imagem: {e}")
-            return {
-                "color": "#808080",
-                "color_palette": ["#808080"],
-                "category": "uncategorized",
-                "subcategory": "uncategorized",
-                "size": {"width": 0, "height": 0},
-                "aspect_ratio": 1.0,
-                "error": str(e)
-            }
+    async def process_clothing_image(self, image_path: str) -> Dict:
+        """Processa imagem para extrair características no pool de workers"""
+        return await image_workers.submit(extract_image_features, image_path)
 
     def color_compatibility(self, color1_hex: str, color2_hex: str) -> Tuple[bool, float]:
         """Verifica compatibilidade de cores e retorna score"""
+        if self.color_lut is not None:
+            rgb1, rgb2 = _parse_hex(color1_hex), _parse_hex(color2_hex)
+            if rgb1 is None or rgb2 is None:
+                return True, 0.7
+            return self.color_lut.pair(int(quantize(rgb1)), int(quantize(rgb2)))
+
         try:
             c1 = color1_hex.lstrip('#')
             c2 = color2_hex.lstrip('#')
@@ -110,93 +381,235 @@ class RecommendationEngine:
         except:
             return True, 0.7  # Fallback
 
-    def generate_daily_outfit(self, items: List[Dict], weather: str, occasion: str, temperature: int) -> List[Dict]:
+    def compute_color_features(self, color_hex: str) -> Optional[Dict]:
+        """Pré-calcula RGB, HSV, flag de neutro e faixa de matiz de uma cor"""
+        parsed = _parse_hex(color_hex)
+        if parsed is None:
+            return None
+
+        r, g, b = parsed
+        h, s, v = colorsys.rgb_to_hsv(r/255, g/255, b/255)
+        is_neutral = s < 0.1 or (abs(r - g) < 30 and abs(g - b) < 30)
+
+        return {
+            "rgb": [r, g, b],
+            "hsv": [h, s, v],
+            "is_neutral": is_neutral,
+            "hue_bucket": int(h * HUE_BUCKETS) % HUE_BUCKETS
+        }
+
+    def color_compatibility_matrix(self, colors_a: List, colors_b: List) -> Tuple[np.ndarray, np.ndarray]:
+        """Compatibilidade NxM entre duas listas de cores numa única passada NumPy.
+
+        Aplica as mesmas regras de `color_compatibility`; aceita hex ou features
+        de `compute_color_features` e retorna as matrizes (compatível, score)
+        com shape (len(colors_a), len(colors_b)).
+        """
+        table_a = _color_table(colors_a)
+        table_b = _color_table(colors_b)
+        invalid = ~(table_a["valid"][:, None] & table_b["valid"][None, :])
+
+        if self.color_lut is not None:
+            compatible, scores = self.color_lut.lookup(table_a["code"], table_b["code"])
+            return compatible | invalid, np.where(invalid, 0.7, scores)
+
+        neutral = table_a["neutral"][:, None] | table_b["neutral"][None, :]
+
+        hue_diff = np.abs(table_a["hue"][:, None] - table_b["hue"][None, :])
+        hue_diff = np.where(hue_diff > 0.5, 1 - hue_diff, hue_diff)
+        harmonic = ((hue_diff > 0.4) & (hue_diff < 0.6)) | (hue_diff < 0.2)
+
+        scores = np.where(neutral, 0.9, np.where(harmonic, 0.8, 1.0 - hue_diff))
+        compatible = neutral | harmonic | (scores > 0.6)
+
+        scores = np.where(invalid, 0.7, scores)
+        compatible = compatible | invalid
+
+        return compatible, scores
+
+    def generate_daily_outfit(self, items: List[Dict], weather: str, occasion: str, temperature: int,
+                              top_k: int = 5, budget_ms: Optional[float] = None) -> List[Dict]:
         """Gera looks para o dia"""
-        if not items:
-            return []
+        outfits, _ = self.search_outfits(items, weather, occasion, temperature, top_k, budget_ms)
+        return outfits
+
+    def search_outfits(self, items: List[Dict], weather: str, occasion: str, temperature: int,
+                       top_k: int = 5, budget_ms: Optional[float] = None) -> Tuple[List[Dict], Dict]:
+        """Busca os top-k looks no guarda-roupa inteiro.
+
+        Cada look é uma base (vestido ou top + bottom compatíveis) com o sapato
+        e o acessório opcionais. As bases são visitadas em ordem decrescente de
+        limite superior de score; um heap de tamanho k guarda os melhores looks
+        e tudo que não pode superar o pior deles é podado. Retorna os looks e
+        as estatísticas da busca (combinações avaliadas, podadas e se o
+        orçamento de tempo `budget_ms` foi esgotado).
+        """
+        stats = {"scored": 0, "pruned": 0, "elapsed_ms": 0.0, "truncated": False}
+        if not items or top_k <= 0:
+            return [], stats
+
+        started = time.perf_counter()
+        deadline = started + budget_ms / 1000 if budget_ms else None
+
+        wardrobe = CompiledWardrobe(items)
+        tops, top_flags = wardrobe.bucket("top")
+        bottoms, bottom_flags = wardrobe.bucket("bottom")
+        dresses, dress_flags = wardrobe.bucket("dress")
+        shoes, shoe_flags = wardrobe.bucket("shoes")
+        accessories, accessory_flags = wardrobe.bucket("accessory")
+        required = required_weather_flags(weather, temperature)
+
+        top_bottom = self._compatibility_with(tops, bottoms)
+        shoe_options = {
+            "dress": _RankedOptions(*self._compatibility_with(dresses, shoes)),
+            "top": _RankedOptions(*self._compatibility_with(tops, shoes))
+        }
+        accessory_options = {
+            "dress": _RankedOptions(*self._compatibility_with(dresses, accessories)),
+            "bottom": _RankedOptions(*self._compatibility_with(bottoms, accessories))
+        }
 
-        tops = [i for i in items if i.get("category") in ["top", "blouse", "shirt", "t-shirt"]]
-        bottoms = [i for i in items if i.get("category") in ["bottom", "pants", "skirt", "jeans"]]
-        dresses = [i for i in items if i.get("category") == "dress"]
-        outerwear = [i for i in items if i.get("category") == "outerwear"]
-        shoes = [i for i in items if i.get("category") == "shoes"]
-        accessories = [i for i in items if i.get("category") == "accessory"]
+        # Limite superior de cada base: score da base + melhor sapato + melhor acessório
+        dress_bounds = (OUTFIT_WEIGHTS["base"] * DRESS_BASE_SCORE
+                        + OUTFIT_WEIGHTS["shoes"] * shoe_options["dress"].best
+                        + OUTFIT_WEIGHTS["accessory"] * accessory_options["dress"].best)
+        tb_compatible, tb_scores = top_bottom
+        tb_valid = tb_compatible & (tb_scores > 0.7)
+        tb_bounds = np.where(
+            tb_valid,
+            OUTFIT_WEIGHTS["base"] * tb_scores
+            + OUTFIT_WEIGHTS["shoes"] * shoe_options["top"].best[:, None]
+            + OUTFIT_WEIGHTS["accessory"] * accessory_options["bottom"].best[None, :],
+            -np.inf
+        )
+
+        # Combinações de cada base, para contar o que a poda descarta
+        dress_with_shoes = shoe_options["dress"].counts > 0
+        shoe_counts = np.maximum(shoe_options["top"].counts, 1)
+        accessory_counts = np.maximum(accessory_options["bottom"].counts, 1)
+        total_combinations = int(
+            (shoe_options["dress"].counts * np.maximum(accessory_options["dress"].counts, 1))[dress_with_shoes].sum()
+            + shoe_counts @ tb_valid.astype(np.int64) @ accessory_counts
+        )
+
+        # As bases saem de uma fila de prioridade por limite: vestidos entram
+        # direto; cada top entra com o melhor bottom e, ao sair, empurra o
+        # próximo bottom da sua lista, ordenada só quando o top é visitado.
+        frontier = [(-float(dress_bounds[d]), 0, d, 0) for d in np.flatnonzero(dress_with_shoes)]
+        top_best = tb_bounds.max(axis=1, initial=-np.inf)
+        frontier += [(-float(top_best[t]), 1, t, 0) for t in np.flatnonzero(np.isfinite(top_best))]
+        heapq.heapify(frontier)
+        bottom_orders: Dict[int, np.ndarray] = {}
+
+        def next_base():
+            neg_bound, kind, index, rank = heapq.heappop(frontier)
+            if kind == 0:
+                base = (DRESS_BASE_SCORE, (int(index),), shoe_options["dress"][index], accessory_options["dress"][index])
+                return -neg_bound, base
+
+            order = bottom_orders.get(index)
+            if order is None:
+                candidates = np.flatnonzero(tb_valid[index])
+                order = bottom_orders[index] = candidates[np.argsort(-tb_bounds[index, candidates], kind="stable")]
+            b = int(order[rank])
+            if rank + 1 < len(order):
+                heapq.heappush(frontier, (-float(tb_bounds[index, order[rank + 1]]), 1, index, rank + 1))
+            base = (float(tb_scores[index, b]), (int(index), b), shoe_options["top"][index], accessory_options["bottom"][b])
+            return -neg_bound, base
+
+        heap = []
+        sequence = 0
+        visited_combinations = 0
+        while frontier:
+            # Sempre avalia ao menos a melhor base (o look guloso), mesmo sem orçamento
+            if deadline is not None and heap and time.perf_counter() > deadline:
+                stats["truncated"] = True
+                break
+
+            if len(heap) == top_k and -frontier[0][0] <= heap[0][0]:
+                stats["pruned"] += total_combinations - visited_combinations
+                break
+
+            _, (base_score, members, shoe_list, accessory_list) = next_base()
+            shoe_choices = shoe_list or [(None, 0.0)]
+            accessory_choices = accessory_list or [(None, 0.0)]
+            visited_combinations += len(shoe_choices) * len(accessory_choices)
+
+            for s, (shoe, shoe_score) in enumerate(shoe_choices):
+                partial = OUTFIT_WEIGHTS["base"] * base_score + OUTFIT_WEIGHTS["shoes"] * shoe_score
+                if len(heap) == top_k and partial + OUTFIT_WEIGHTS["accessory"] * accessory_choices[0][1] <= heap[0][0]:
+                    stats["pruned"] += (len(shoe_choices) - s) * len(accessory_choices)
+                    break
 
-        outfits = []
+                for a, (accessory, accessory_score) in enumerate(accessory_choices):
+                    score = partial + OUTFIT_WEIGHTS["accessory"] * accessory_score
+                    stats["scored"] += 1
 
-        for dress in dresses[:2]:
-            compatible_shoes = self.find_compatible_items(dress, shoes)
-            compatible_accessories = self.find_compatible_items(dress, accessories)
+                    if len(heap) < top_k:
+                        heapq.heappush(heap, (score, -sequence, (members, shoe, shoe_score, accessory, accessory_score)))
+                    elif score > heap[0][0]:
+                        heapq.heapreplace(heap, (score, -sequence, (members, shoe, shoe_score, accessory, accessory_score)))
+                    else:
+                        stats["pruned"] += len(accessory_choices) - a - 1
+                        break
+                    sequence += 1
 
-            if compatible_shoes:
+        outfits = []
+        for score, _, (members, shoe, shoe_score, accessory, accessory_score) in sorted(heap, reverse=True):
+            extras = []
+            extra_flags = 0
+            if shoe is not None:
+                extras.append(dict(shoes[shoe], compatibility_score=shoe_score))
+                extra_flags |= int(shoe_flags[shoe])
+            if accessory is not None:
+                extras.append(dict(accessories[accessory], compatibility_score=accessory_score))
+                extra_flags |= int(accessory_flags[accessory])
+
+            if len(members) == 1:
+                dress = dresses[members[0]]
                 outfit = {
                     "type": "dress_outfit",
-                    "items": [dress, compatible_shoes[0]] + compatible_accessories[:2],
-                    "confidence": 0.85,
+                    "items": [dress] + extras,
+                    "confidence": score,
                     "description": f"Vestido {dress.get('color', '')} para {occasion}",
-                    "weather_suitable": self.check_weather_suitability([dress], weather, temperature)
+                    "weather_suitable": int(dress_flags[members[0]]) & required == required
                 }
-                outfits.append(outfit)
-
-        for top in tops[:3]:
-            for bottom in bottoms[:3]:
-                compatible, score = self.color_compatibility(
-                    top.get("color_hex", "#000000"),
-                    bottom.get("color_hex", "#FFFFFF")
-                )
-
-                if compatible and score > 0.7:
-                    compatible_shoes = self.find_compatible_items(top, shoes)
-                    compatible_accessories = self.find_compatible_items(bottom, accessories)
-
-                    items_list = [top, bottom]
-                    if compatible_shoes:
-                        items_list.append(compatible_shoes[0])
-                    if compatible_accessories:
-                        items_list.append(compatible_accessories[0])
-
-                    outfit = {
-                        "type": "top_bottom_outfit",
-                        "items": items_list,
-                        "confidence": score,
-                        "description": f"{top.get('subcategory', 'Top')} + {bottom.get('subcategory', 'Bottom')}",
-                        "weather_suitable": self.check_weather_suitability(items_list, weather, temperature)
-                    }
-                    outfits.append(outfit)
-
-        outfits.sort(key=lambda x: x["confidence"], reverse=True)
-        return outfits[:5]
+            else:
+                top, bottom = tops[members[0]], bottoms[members[1]]
+                items_list = [top, bottom] + extras
+                flags = int(top_flags[members[0]]) | int(bottom_flags[members[1]]) | extra_flags
+                outfit = {
+                    "type": "top_bottom_outfit",
+                    "items": items_list,
+                    "confidence": score,
+                    "description": f"{top.get('subcategory', 'Top')} + {bottom.get('subcategory', 'Bottom')}",
+                    "weather_suitable": flags & required == required
+                }
+            outfits.append(outfit)
+
+        stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return outfits, stats
 
     def find_compatible_items(self, base_item: Dict, item_list: List[Dict], min_score: float = 0.7) -> List[Dict]:
         """Encontra itens compatíveis com um item base"""
-        compatible = []
-        base_color = base_item.get("color_hex", "#000000")
+        compatible, scores = self._compatibility_with([base_item], item_list)
+        return _select_compatible(item_list, compatible[0], scores[0], min_score)
 
-        for item in item_list:
-            compatible, score = self.color_compatibility(base_color, item.get("color_hex", "#FFFFFF"))
-            if compatible and score >= min_score:
-                item["compatibility_score"] = score
-                compatible.append(item)
-
-        compatible.sort(key=lambda x: x.get("compatibility_score", 0), reverse=True)
-        return compatible
+    def _compatibility_with(self, items_a: List[Dict], items_b: List[Dict],
+                            default_a: str = "#000000", default_b: str = "#FFFFFF") -> Tuple[np.ndarray, np.ndarray]:
+        """Matrizes de compatibilidade entre duas listas de itens"""
+        return self.color_compatibility_matrix(
+            [i.get("color_features") or i.get("color_hex", default_a) for i in items_a],
+            [i.get("color_features") or i.get("color_hex", default_b) for i in items_b]
+        )
 
     def check_weather_suitability(self, items: List[Dict], weather: str, temperature: int) -> bool:
         """Verifica se os itens são adequados para o clima"""
-        if weather == "rainy":
-            waterproof_items = [i for i in items if i.get("fabric") in ["nylon", "polyester", "waterproof"]]
-            return len(waterproof_items) > 0
-
-        if weather == "cold" or temperature < 15:
-            warm_items = [i for i in items if i.get("category") in ["outerwear", "sweater"]]
-            return len(warm_items) > 0
-
-        if weather == "hot" or temperature > 28:
-            light_fabrics = ["cotton", "linen", "silk"]
-            light_items = [i for i in items if i.get("fabric") in light_fabrics]
-            return len(light_items) > 0
-
-        return True
+        required = required_weather_flags(weather, temperature)
+        flags = 0
+        for item in items:
+            flags |= _item_flags(item)
+        return flags & required == required
 
     def analyze_color_season(self, skin_tone: str, eye_color: str, hair_color: str) -> Dict:
         """Analisa a temporada de cores do usuário"""
@@ -222,43 +635,98 @@ class RecommendationEngine:
 
     def get_complementary_palette(self, season: str) -> List[str]:
         """Retorna paleta complementar (cores a evitar)"""
-        complementary_map = {
-            "winter": ["#D2691E", "#8B4513", "#556B2F"],  # Evitar cores outono
-            "summer": ["#FF8C00", "#8B0000", "#2F4F4F"],  # Evitar cores inverno/outono
-            "autumn": ["#4169E1", "#800080", "#00CED1"],  # Evitar cores inverno/verão
-            "spring": ["#8B0000", "#4B0082", "#2F4F4F"]   # Evitar cores inverno
-        }
-        return complementary_map.get(season, [])
+        return self.avoid_palettes.get(season, [])
+
+    def palette_fit(self, colors: List[str]) -> List[Dict]:
+        """Encaixe de cada cor (CIELAB, ΔE) na paleta e nas cores a evitar de cada temporada"""
+        return self.palette_index.match(colors)
+
+    def score_closet_palette(self, items: List[Dict], season: str) -> Dict:
+        """Resume quantas peças do guarda-roupa combinam com a paleta da temporada.
+
+        Usa o `palette_fit` gravado em cada peça; as que ainda não têm são
+        calculadas numa única chamada vetorizada.
+        """
+        missing = [item for item in items if season not in (item.get("palette_fit") or {})]
+        if missing:
+            fits = self.palette_index.match([item.get("color_hex") or "#808080" for item in missing])
+            for item, fit in zip(missing, fits):
+                item["palette_fit"] = {**(item.get("palette_fit") or {}), **fit}
+
+        return summarize_palette_fit(items, season)
 
     def generate_shopping_recommendations(self, user_items: List[Dict], gaps: List[str]) -> List[Dict]:
-        """Gera recomendações de compras baseadas em gaps no guarda-roupa"""
+        """Gera recomendações de compras baseadas em gaps no guarda-roupa.
+
+        `estimated_new_outfits` conta os looks válidos (mesmas regras de
+        `search_outfits`) que passariam a existir com a peça, a partir de
+        contagens vetorizadas de compatibilidade, sem enumerar os looks. Peças
+        que não criam nenhum look (ex.: casacos) ficam com prioridade média.
+        """
         recommendations = []
 
-        basic_items = {
-            "white_shirt": {"category": "top", "subcategory": "shirt", "color": "white"},
-            "black_pants": {"category": "bottom", "subcategory": "pants", "color": "black"},
-            "blue_jeans": {"category": "bottom", "subcategory": "jeans", "color": "blue"},
-            "little_black_dress": {"category": "dress", "subcategory": "dress", "color": "black"},
-            "neutral_blazer": {"category": "outerwear", "subcategory": "blazer", "color": "neutral"}
+        wardrobe = CompiledWardrobe(user_items)
+        groups = {group: wardrobe.bucket(group)[0] for group in ("top", "bottom", "dress", "shoes", "accessory")}
+
+        counts = {
+            "top_shoes": _option_counts(*self._compatibility_with(groups["top"], groups["shoes"])),
+            "bottom_accessories": _option_counts(*self._compatibility_with(groups["bottom"], groups["accessory"]))
         }
 
-        for item_name, item_specs in basic_items.items():
-            has_similar = False
-            for user_item in user_items:
-                if (user_item.get("category") == item_specs["category"] and
-                    user_item.get("color") == item_specs["color"]):
-                    has_similar = True
-                    break
+        owned = {
+            (user_item.get("category"),
+             user_item.get("color_family") or color_family(user_item.get("color"), user_item.get("color_hex")))
+            for user_item in user_items
+        }
+
+        for item_name, item_specs in SHOPPING_BASICS.items():
+            has_similar = any((item_specs["category"], family) in owned for family in item_specs["color_families"])
 
             if not has_similar:
+                new_outfits, matches = self._unlocked_outfits(item_specs, groups, counts)
                 recommendations.append({
                     "item": item_name.replace("_", " ").title(),
                     "category": item_specs["category"],
-                    "reason": f"Item básico que combina com {len([i for i in user_items if i.get('color') != item_specs['color']])} peças do seu guarda-roupa",
-                    "priority": "alta",
-                    "estimated_new_outfits": random.randint(3, 8)
+                    "reason": f"Item básico que combina com {matches} peças do seu guarda-roupa",
+                    "priority": "alta" if new_outfits else "media",
+                    "estimated_new_outfits": new_outfits
                 })
 
+        recommendations.sort(key=lambda r: r["estimated_new_outfits"], reverse=True)
         return recommendations[:5]
 
-engine = RecommendationEngine()
\ No newline at end of file
+    def _unlocked_outfits(self, candidate: Dict, groups: Dict[str, List[Dict]],
+                          counts: Dict[str, np.ndarray]) -> Tuple[int, int]:
+        """(looks novos, peças compatíveis) que uma peça candidata traria"""
+        def row(group, min_score=0.7, strict=False):
+            compatible, scores = self._compatibility_with([candidate], groups[group])
+            return compatible[0] & (scores[0] > min_score if strict else scores[0] >= min_score)
+
+        group = _category_group(candidate["category"])
+        if group == "top":
+            bottoms = row("bottom", strict=True)
+            shoes = int(row("shoes").sum())
+            accessories = np.maximum(counts["bottom_accessories"], 1)
+            return max(shoes, 1) * int(accessories[bottoms].sum()), int(bottoms.sum()) + shoes
+
+        if group == "bottom":
+            compatible, scores = self._compatibility_with(groups["top"], [candidate])
+            tops = compatible[:, 0] & (scores[:, 0] > 0.7)
+            accessories = int(row("accessory").sum())
+            shoes = np.maximum(counts["top_shoes"], 1)
+            return max(accessories, 1) * int(shoes[tops].sum()), int(tops.sum()) + accessories
+
+        if group == "dress":
+            shoes = int(row("shoes").sum())
+            accessories = int(row("accessory").sum())
+            return shoes * max(accessories, 1), shoes + accessories
+
+        if group == "outerwear":
+            # `search_outfits` não monta looks com terceira peça: combina, mas não cria looks
+            tops = row("top")
+            dresses = row("dress")
+            return 0, int(tops.sum() + dresses.sum())
+
+        return 0, 0
+
+engine = RecommendationEngine()
@@ -0,0 +1,55 @@
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import User, UserSession
+from services.cache import TTLCache
+
+# jti do access token -> id do usuário, só para sessões ativas.
+# O cache é por processo: uma sessão revogada em outro worker continua aceita
+# aqui por até SESSION_CACHE_TTL segundos.
+session_cache = TTLCache(settings.SESSION_CACHE_SIZE, settings.SESSION_CACHE_TTL)
+# id do usuário -> valores das colunas de `users`
+user_cache = TTLCache(settings.SESSION_CACHE_SIZE, settings.SESSION_CACHE_TTL)
+
+USER_COLUMNS = [column.key for column in User.__table__.columns]
+
+def user_snapshot(user: User) -> Dict:
+    return {column: getattr(user, column) for column in USER_COLUMNS}
+
+def session_user(db: Session, user_id: str, jti: str) -> Optional[User]:
+    """Usuário dono da sessão ativa `jti`, sem consultas ao banco quando está em cache.
+
+    Retorna uma instância desanexada da sessão do banco; para alterar o usuário
+    carregue-o de novo com `db`.
+    """
+    if session_cache.get(jti) != user_id:
+        session = db.query(UserSession.id).filter(
+            UserSession.user_id == user_id,
+            UserSession.access_token_jti == jti,
+            UserSession.is_active == True
+        ).first()
+        if session is None:
+            return None
+        session_cache.set(jti, user_id)
+
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is None:
+            session_cache.pop(jti)
+            return None
+        snapshot = user_snapshot(user)
+        user_cache.set(user_id, snapshot)
+
+    return User(**snapshot)
+
+def forget_sessions(*jtis: Optional[str]):
+    """Logout, revogação e refresh: neste processo, a próxima requisição com estes tokens volta ao banco"""
+    for jti in jtis:
+        if jti:
+            session_cache.pop(jti)
+
+def forget_user(user_id: str):
+    user_cache.pop(user_id)
@@ -0,0 +1,278 @@
+import os
+import hashlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiofiles
+from fastapi import Request, status
+
+try:
+    from python_multipart.exceptions import FormParserError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:
+    from multipart.exceptions import FormParserError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from models import generate_uuid
+
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", "png"),
+    (b"GIF87a", "image/gif", "gif"),
+    (b"GIF89a", "image/gif", "gif")
+]
+ALLOWED_UPLOAD_TYPES = ["image/jpeg", "image/png", "image/webp", "image/gif"]
+SNIFF_BYTES = 12
+MAX_FIELD_SIZE = 64 * 1024
+FORM_OVERHEAD = 16 * 1024  # cabeçalhos e campos do multipart além do arquivo
+
+class UploadRejected(Exception):
+    """Arquivo ou requisição recusados durante o recebimento"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+class StoredUpload:
+    """Arquivo recebido e gravado em disco durante o streaming.
+
+    O arquivo final é endereçado pelo conteúdo (`{sha256}.{ext}`); `is_new`
+    indica se este upload criou o blob ou se ele já existia em disco.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.item_id = generate_uuid()
+        self.content_type: Optional[str] = None
+        self.extension: Optional[str] = None
+        self.sha256: Optional[str] = None
+        self.stored_name: Optional[str] = None
+        self.path: Optional[str] = None
+        self.is_new = False
+        self.size = 0
+        self.error: Optional[UploadRejected] = None
+        self._head = b""
+        self._file = None
+        self._temp_path: Optional[str] = None
+        self._digest = hashlib.sha256()
+
+def sniff_image_type(head: bytes) -> Optional[Tuple[str, str]]:
+    """(content type, extensão) a partir dos magic bytes, ou None"""
+    for signature, content_type, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type, extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", "webp"
+    return None
+
+def too_large_error(max_size: int) -> UploadRejected:
+    return UploadRejected(
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        f"Arquivo muito grande. Tamanho máximo: {max_size / (1024*1024)}MB"
+    )
+
+class _MultipartReceiver:
+    """Recebe um multipart/form-data em chunks gravando os arquivos direto no destino.
+
+    Os callbacks do parser apenas enfileiram eventos; a gravação assíncrona
+    (aiofiles) acontece entre um chunk e outro. O tipo é detectado pelos
+    primeiros bytes e o limite de tamanho é verificado a cada chunk.
+    """
+
+    def __init__(self, upload_dir: str, max_size: int, max_files: int, strict: bool,
+                 on_file: Optional[Callable[[StoredUpload], None]]):
+        self.upload_dir = upload_dir
+        self.max_size = max_size
+        self.max_files = max_files
+        self.strict = strict
+        self.on_file = on_file
+
+        self.fields: Dict[str, str] = {}
+        self.files: List[StoredUpload] = []
+        self.events = []
+
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+        self._current: Optional[StoredUpload] = None
+        self._field_name: Optional[str] = None
+        self._field_data = bytearray()
+
+    def callbacks(self) -> Dict:
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": lambda data, start, end: self.events.append(("data", data[start:end])),
+            "on_part_end": lambda: self.events.append(("end", None)),
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": lambda: self.events.append(("headers", self._headers))
+        }
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    async def drain(self):
+        events, self.events = self.events, []
+        for kind, payload in events:
+            if kind == "headers":
+                await self._begin(payload)
+            elif kind == "data":
+                await self._data(payload)
+            else:
+                await self._end()
+
+    async def _begin(self, headers: Dict):
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+
+        if filename is None:
+            self._current = None
+            self._field_name = options.get(b"name", b"").decode("utf-8", "replace")
+            self._field_data = bytearray()
+            return
+
+        if len(self.files) >= self.max_files:
+            raise UploadRejected(
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                f"Envie no máximo {self.max_files} arquivos por vez"
+            )
+
+        self._current = StoredUpload(filename.decode("utf-8", "replace"))
+        self.files.append(self._current)
+
+    async def _data(self, data: bytes):
+        upload = self._current
+        if upload is None:
+            if len(self._field_data) + len(data) > MAX_FIELD_SIZE:
+                raise UploadRejected(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "Campo de formulário muito grande")
+            self._field_data += data
+            return
+
+        if upload.error:
+            return
+
+        upload.size += len(data)
+        if upload.size > self.max_size:
+            await self._reject(upload, too_large_error(self.max_size))
+            return
+
+        if upload._file is None:
+            upload._head += data
+            if len(upload._head) >= SNIFF_BYTES:
+                await self._open(upload)
+            return
+
+        upload._digest.update(data)
+        await upload._file.write(data)
+
+    async def _end(self):
+        upload = self._current
+        if upload is None:
+            self.fields[self._field_name] = self._field_data.decode("utf-8", "replace")
+            return
+
+        if not upload.error and upload._file is None:
+            await self._open(upload)
+        if upload.error:
+            return
+
+        await upload._file.close()
+        upload._file = None
+
+        upload.sha256 = upload._digest.hexdigest()
+        upload.stored_name = f"{upload.sha256}.{upload.extension}"
+        upload.path = os.path.join(self.upload_dir, upload.stored_name)
+        if os.path.exists(upload.path):
+            os.remove(upload._temp_path)
+        else:
+            os.replace(upload._temp_path, upload.path)
+            upload.is_new = True
+        upload._temp_path = None
+
+        if self.on_file:
+            self.on_file(upload)
+
+    async def _open(self, upload: StoredUpload):
+        sniffed = sniff_image_type(upload._head)
+        if sniffed is None:
+            await self._reject(upload, UploadRejected(
+                status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                f"Tipo de arquivo não suportado. Tipos permitidos: {', '.join(ALLOWED_UPLOAD_TYPES)}"
+            ))
+            return
+
+        upload.content_type, upload.extension = sniffed
+        upload._temp_path = os.path.join(self.upload_dir, f"{upload.item_id}.part")
+        upload._file = await aiofiles.open(upload._temp_path, "wb")
+        upload._digest.update(upload._head)
+        await upload._file.write(upload._head)
+        upload._head = b""
+
+    async def _reject(self, upload: StoredUpload, error: UploadRejected):
+        upload.error = error
+        await discard(upload)
+        if self.strict:
+            raise error
+
+async def discard(upload: StoredUpload):
+    """Fecha e remove o que este upload gravou (nunca um blob que já existia)"""
+    if upload._file is not None:
+        await upload._file.close()
+        upload._file = None
+    if upload._temp_path and os.path.exists(upload._temp_path):
+        os.remove(upload._temp_path)
+    if upload.is_new and upload.path and os.path.exists(upload.path):
+        os.remove(upload.path)
+    upload._temp_path = None
+    upload.is_new = False
+
+async def receive_uploads(request: Request, upload_dir: str, max_size: int, max_files: int = 1,
+                          strict: bool = False,
+                          on_file: Optional[Callable[[StoredUpload], None]] = None
+                          ) -> Tuple[Dict[str, str], List[StoredUpload]]:
+    """Lê o corpo multipart em streaming e grava cada arquivo em `upload_dir`.
+
+    Retorna (campos do formulário, arquivos). Com `strict`, o primeiro arquivo
+    recusado interrompe a leitura com `UploadRejected`; sem ele, o erro fica em
+    `StoredUpload.error` e os demais arquivos seguem. `on_file` é chamado assim
+    que cada arquivo válido termina de ser gravado.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadRejected(status.HTTP_400_BAD_REQUEST, "Envie os arquivos como multipart/form-data")
+
+    declared_size = int(request.headers.get("content-length") or 0)
+    if declared_size > max_files * max_size + FORM_OVERHEAD:
+        raise too_large_error(max_size)
+
+    os.makedirs(upload_dir, exist_ok=True)
+    receiver = _MultipartReceiver(upload_dir, max_size, max_files, strict, on_file)
+    parser = MultipartParser(params[b"boundary"], receiver.callbacks())
+
+    try:
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                await receiver.drain()
+            parser.finalize()
+            await receiver.drain()
+        except FormParserError:
+            raise UploadRejected(status.HTTP_400_BAD_REQUEST, "Corpo multipart inválido")
+    except BaseException:
+        for upload in receiver.files:
+            await discard(upload)
+        raise
+
+    return receiver.fields, receiver.files
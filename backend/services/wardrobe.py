@@ -0,0 +1,41 @@
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import ClothingItem, WardrobeVersion
+from services.cache import TTLCache
+from services.recommendation_engine import temperature_bucket
+
+daily_outfit_cache = TTLCache(settings.OUTFIT_CACHE_SIZE, settings.OUTFIT_CACHE_TTL)
+shopping_cache = TTLCache(settings.OUTFIT_CACHE_SIZE, settings.OUTFIT_CACHE_TTL)
+
+def wardrobe_version(db: Session, user_id: str) -> int:
+    """Versão atual do guarda-roupa (0 se nunca foi alterado)"""
+    version = db.query(WardrobeVersion.version).filter(WardrobeVersion.user_id == user_id).scalar()
+    return version or 0
+
+def bump_wardrobe_version(db: Session, user_id: str):
+    """Marca o guarda-roupa como alterado; chamar na mesma transação da escrita"""
+    updated = db.query(WardrobeVersion).filter(WardrobeVersion.user_id == user_id).update(
+        {"version": WardrobeVersion.version + 1}, synchronize_session=False
+    )
+    if not updated:
+        db.add(WardrobeVersion(user_id=user_id, version=1))
+
+def outfit_item(item: ClothingItem) -> Dict:
+    """Campos de uma peça usados pela busca de looks"""
+    return {
+        "id": item.id,
+        "category": item.category,
+        "subcategory": item.subcategory,
+        "color": item.color,
+        "color_hex": item.color_hex,
+        "image_url": item.image_url,
+        "fabric": item.fabric,
+        "brand": item.brand,
+        "color_features": (item.processed_features or {}).get("color_features")
+    }
+
+def daily_outfit_key(user_id: str, version: int, weather: str, occasion: str, temperature: int,
+                     top_k: int, budget_ms: Optional[float]) -> tuple:
+    return (user_id, version, weather, occasion, temperature_bucket(temperature), top_k, budget_ms)
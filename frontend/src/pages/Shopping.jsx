@@ -240,7 +240,7 @@ const Shopping = () => {
             {filteredRecommendations.map((rec, index) => {
               const price = getSimulatedPrice();
               const sustainabilityScore = getSustainabilityScore();
-              const newOutfits = rec.estimated_new_outfits || Math.floor(Math.random() * 10) + 1;
+              const newOutfits = rec.estimated_new_outfits ?? 0;
               
               return (
                 <div key={index} className="card group hover:shadow-lg transition">
@@ -254,7 +254,7 @@ const Shopping = () => {
                     </div>
                     <div className="flex items-center">
                       <div className="px-2 py-1 bg-primary-100 text-primary-800 rounded text-xs font-semibold">
-                        Alta Prioridade
+                        {rec.priority === 'media' ? 'Média Prioridade' : 'Alta Prioridade'}
                       </div>
                     </div>
                   </div>
@@ -262,8 +262,12 @@ const Shopping = () => {
                   {/* Value Proposition */}
                   <div className="p-4 bg-blue-50 rounded-lg mb-4">
                     <p className="text-sm text-blue-800">
-                      <span className="font-semibold">Essa peça criaria {newOutfits} novos looks</span>
-                      <br />
+                      {newOutfits > 0 && (
+                        <>
+                          <span className="font-semibold">Essa peça criaria {newOutfits} novos looks</span>
+                          <br />
+                        </>
+                      )}
                       {rec.reason || 'Combina com várias peças do seu guarda-roupa'}
                     </p>
                   </div>